@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import engine, lock_transaction
+
+# Closed loans older than the horizon move from history to history_archive, keeping
+# the table that borrow/return and recent-history queries touch small. Rows keep
+# their ids, so combined reads can still order by id.
+
+HISTORY_ARCHIVE_AFTER_DAYS = float(os.getenv("HISTORY_ARCHIVE_AFTER_DAYS", 365))
+HISTORY_ARCHIVE_SECONDS = float(os.getenv("HISTORY_ARCHIVE_SECONDS", 86400))
+HISTORY_ARCHIVE_BATCH_SIZE = int(os.getenv("HISTORY_ARCHIVE_BATCH_SIZE", 5000))
+ARCHIVE_LOCK_ID = 724012
+
+log = logging.getLogger("app.archive")
+
+def archive_batch(conn, before: datetime, batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE):
+    # Runs inside run_sync; copy then delete one batch of loans returned before the cutoff
+    history = models.History.__table__
+    archive = models.HistoryArchive.__table__
+    # Every worker runs the job; batches queue on the lock, so two workers never pick
+    # the same ids and copy them twice
+    lock_transaction(conn, f"SELECT pg_advisory_xact_lock({ARCHIVE_LOCK_ID})")
+    ids = conn.execute(
+        select(history.c.id).where(history.c.return_date < before).order_by(history.c.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    columns = [column.name for column in archive.columns]
+    conn.execute(archive.insert().from_select(
+        columns, select(*[history.c[name] for name in columns]).where(history.c.id.in_(ids))
+    ))
+    conn.execute(history.delete().where(history.c.id.in_(ids)))
+    return len(ids)
+
+async def archive_closed_loans(engine=engine, days: float = HISTORY_ARCHIVE_AFTER_DAYS, batch_size: int = HISTORY_ARCHIVE_BATCH_SIZE):
+    # One transaction per batch so borrow/return never wait on the whole move
+    before = datetime.utcnow() - timedelta(days=days)
+    moved = 0
+    while True:
+        async with engine.begin() as conn:
+            count = await conn.run_sync(archive_batch, before, batch_size)
+        moved += count
+        if count < batch_size:
+            return moved
+
+async def archived_through(db: AsyncSession):
+    # Latest issue date in the archive; ranges starting after it only need the hot table
+    result = await db.execute(select(func.max(models.HistoryArchive.issue_date)))
+    return result.scalar_one()
+
+async def archive_periodically(engine, interval: float = HISTORY_ARCHIVE_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await archive_closed_loans(engine)
+        except Exception:
+            # Rows left behind are picked up by the next run
+            log.exception("history archive failed")
+
+if __name__ == "__main__":
+    # python -m app.archive
+    print(f"archived {asyncio.run(archive_closed_loans(engine))} closed loans")
@@ -1,9 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from . import crud, models, schemas
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from .database import get_db
+from .user_cache import user_cache
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -11,7 +12,14 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+def _detached_copy(user: models.User):
+    # Cache a clean copy so later changes to the request's instance never leak into it
+    snapshot = models.User(**{c.key: getattr(user, c.key) for c in models.User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    from jose import JWTError, jwt
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,9 +34,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         token_data = schemas.TokenData(username=username, role=role)
     except JWTError:
         raise credentials_exception
+    version = await user_cache.sync()
+    cached = user_cache.get(token_data.username)
+    if cached is not None:
+        # Attach a per-request copy to this session without a round trip
+        return await db.merge(cached, load=False)
     user = await crud.get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
+    user_cache.set(user.username, _detached_copy(user), token_exp=payload.get("exp"), version=version)
     return user
 
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
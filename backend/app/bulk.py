@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from pydantic import ValidationError
+from . import schemas
+
+# Streaming helpers for bulk catalog import/export (NDJSON or CSV).
+
+BOOK_EXPORT_FIELDS = ["id", "title", "author", "status", "borrower_id"]
+
+async def iter_lines(chunks):
+    # Split an async byte stream into decoded lines without buffering the whole body
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+def _parse_book(data):
+    return schemas.BookCreate.model_validate(data)
+
+async def parse_ndjson(lines):
+    # Yields (line_number, BookCreate or None, error message or None)
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, _parse_book(json.loads(line)), None
+        except json.JSONDecodeError as exc:
+            yield line_number, None, f"Invalid JSON: {exc.msg}"
+        except ValidationError as exc:
+            yield line_number, None, _format_validation_error(exc)
+
+async def parse_csv(lines):
+    # The first line is a header naming at least the title and author columns
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield line_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        try:
+            yield line_number, _parse_book(dict(zip(header, values))), None
+        except ValidationError as exc:
+            yield line_number, None, _format_validation_error(exc)
+
+def _format_validation_error(exc: ValidationError):
+    messages = []
+    for err in exc.errors():
+        field = ".".join(str(part) for part in err["loc"])
+        messages.append(f"{field}: {err['msg']}" if field else err["msg"])
+    return "; ".join(messages)
+
+def book_row(book):
+    return {field: getattr(book, field) for field in BOOK_EXPORT_FIELDS}
+
+def to_ndjson(books):
+    return "".join(json.dumps(book_row(book)) + "\n" for book in books)
+
+def to_csv(books, header: bool = False):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(BOOK_EXPORT_FIELDS)
+    for book in books:
+        writer.writerow([getattr(book, field) for field in BOOK_EXPORT_FIELDS])
+    return out.getvalue()
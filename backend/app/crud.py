@@ -1,45 +1,64 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from . import models, schemas
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+from . import models, schemas, search, hashing, stats, events, archive
+from .user_cache import user_cache
+from .response_cache import catalog_cache
 import os
 from datetime import datetime, timedelta
+from typing import Optional
+from collections import Counter
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await hashing.verify_password(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await hashing.hash_password(password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    from jose import jwt  # deferred with the rest of the crypto stack, see hashing.pwd_context
     return jwt.encode(to_encode, SECRET_KEY, ALGORITHM)
 
+# Change feed payloads
+def _publish_book(event_type: str, book):
+    events.publish(event_type, schemas.BookResponse.model_validate(book).model_dump(mode="json"))
+
+def _publish_member(event_type: str, user):
+    events.publish(event_type, schemas.UserResponse.model_validate(user).model_dump(mode="json"))
+
 # CRUD for Users
 async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(select(models.User).where(models.User.username == username))
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         password_hash=hashed_password,
         role=user.role.upper(),
     )
     db.add(db_user)
+    await db.flush()
+    db.add(models.MemberSummary(member_id=db_user.id))
+    if db_user.role == "MEMBER":
+        await stats.bump(db, members_active=1)
     await db.commit()
     await db.refresh(db_user)
+    user_cache.invalidate(db_user.username)
+    if db_user.role == "MEMBER":
+        _publish_member("member.created", db_user)
     return db_user
 
 # CRUD for Books
@@ -47,42 +66,177 @@ async def get_book(db: AsyncSession, book_id: int):
     result = await db.execute(select(models.Book).where(models.Book.id == book_id))
     return result.scalars().first()
 
-async def get_books(db: AsyncSession, skip: int = 0, limit: int = 100):
-    result = await db.execute(select(models.Book).offset(skip).limit(limit))
-    return result.scalars().all()
+# The list readers take an optional column list (see serialization.schema_columns)
+# and then return plain rows instead of ORM instances
+def _entities_or_columns(model, columns: Optional[list]):
+    return select(*columns) if columns else select(model)
+
+def _all(result, columns: Optional[list]):
+    return result.all() if columns else result.scalars().all()
+
+def _page(query, model, skip: int, limit: int, after_id: Optional[int]):
+    query = query.order_by(model.id)
+    if after_id is not None:
+        # Keyset mode: seek past the last seen primary key instead of scanning skipped rows
+        query = query.where(model.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+async def _search(db: AsyncSession, model, q: str, limit: int):
+    query = search.search_query(db.bind.dialect.name, q, limit, table=model.__tablename__)
+    if query is None:
+        return []
+    ids = (await db.execute(query)).scalars().all()
+    if not ids:
+        return []
+    result = await db.execute(select(model).where(model.id.in_(ids)))
+    rows = {row.id: row for row in result.scalars().all()}
+    # Keep the relevance order from the index
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+async def get_books(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, columns: Optional[list] = None):
+    result = await db.execute(_page(_entities_or_columns(models.Book, columns), models.Book, skip, limit, after_id))
+    return _all(result, columns)
+
+async def get_available_books(db: AsyncSession, columns: Optional[list] = None):
+    result = await db.execute(
+        _entities_or_columns(models.Book, columns).where(models.Book.status == "AVAILABLE").order_by(models.Book.id)
+    )
+    return _all(result, columns)
+
+async def search_books(db: AsyncSession, q: str, limit: int = 20):
+    return await _search(db, models.Book, q, limit)
+
+# Titles are created on first use; copies of the same (title, author) share one
+async def _ensure_titles(db: AsyncSession, pairs: list):
+    pairs = list(dict.fromkeys(pairs))
+    dialect_insert = sqlite_insert if db.bind.dialect.name == "sqlite" else postgresql_insert
+    await db.execute(
+        dialect_insert(models.Title)
+        .values([{"title": title, "author": author, "total_copies": 0, "available_copies": 0} for title, author in pairs])
+        .on_conflict_do_nothing(index_elements=["title", "author"])
+    )
+    result = await db.execute(
+        select(models.Title.id, models.Title.title, models.Title.author)
+        .where(tuple_(models.Title.title, models.Title.author).in_(pairs))
+    )
+    return {(title, author): title_id for title_id, title, author in result.all()}
+
+def _copy_deltas(changes):
+    # (title_id, status, +1 added / -1 removed) per copy -> title_id -> (total, available) deltas
+    deltas = {}
+    for title_id, status, sign in changes:
+        total, available = deltas.get(title_id, (0, 0))
+        deltas[title_id] = (total + sign, available + sign * (status == "AVAILABLE"))
+    return deltas
+
+def _availability_deltas(books, change: int):
+    # Borrow and return flip a copy's status without changing the title's total
+    counts = Counter(book.title_id for book in books)
+    return {title_id: (0, change * count) for title_id, count in counts.items()}
 
 async def create_book(db: AsyncSession, book: schemas.BookCreate):
-    db_book = models.Book(**book.dict())
+    title_ids = await _ensure_titles(db, [(book.title, book.author)])
+    db_book = models.Book(**book.dict(), title_id=title_ids[(book.title, book.author)])
     db.add(db_book)
+    await stats.bump(db, books_total=1, books_available=1)
+    await stats.bump_titles(db, {db_book.title_id: (1, 1)})
+    await stats.bump_version(db, stats.CATALOG_VERSION)
     await db.commit()
+    catalog_cache.expire()
     await db.refresh(db_book)
+    _publish_book("book.created", db_book)
     return db_book
 
+async def bulk_create_books(db: AsyncSession, books: list):
+    # One executemany INSERT and one commit for the whole chunk
+    if books:
+        title_ids = await _ensure_titles(db, [(book.title, book.author) for book in books])
+        rows = [{**book.dict(), "title_id": title_ids[(book.title, book.author)]} for book in books]
+        await db.execute(insert(models.Book), rows)
+        await stats.bump(db, books_total=len(books), books_available=len(books))
+        await stats.bump_titles(db, _copy_deltas((row["title_id"], "AVAILABLE", 1) for row in rows))
+        await stats.bump_version(db, stats.CATALOG_VERSION)
+        await db.commit()
+        catalog_cache.expire()
+        # Too many rows for per-book deltas; clients reload the catalog instead
+        events.publish("books.imported", {"count": len(books)})
+    return len(books)
+
+async def stream_books(db: AsyncSession, batch_size: int = 1000):
+    # Server-side cursor over the catalog, fetched batch_size rows at a time
+    result = await db.stream_scalars(
+        select(models.Book).order_by(models.Book.id).execution_options(yield_per=batch_size)
+    )
+    async for partition in result.partitions():
+        yield partition
+
 async def update_book(db: AsyncSession, book_id: int, book: schemas.BookUpdate):
     db_book = await get_book(db, book_id)
     if db_book:
+        old_status, old_title_id = db_book.status, db_book.title_id
+        old_name = (db_book.title, db_book.author)
         for key, value in book.dict(exclude_unset=True).items():
             setattr(db_book, key, value)
+        if (db_book.title, db_book.author) != old_name or db_book.title_id is None:
+            # Retitling a copy moves it to the matching title
+            title_ids = await _ensure_titles(db, [(db_book.title, db_book.author)])
+            db_book.title_id = title_ids[(db_book.title, db_book.author)]
         db.add(db_book)
+        if db_book.status != old_status:
+            await stats.bump(db, **stats.book_status_deltas(old_status, db_book.status))
+        await stats.bump_titles(db, _copy_deltas([(old_title_id, old_status, -1), (db_book.title_id, db_book.status, 1)]))
+        await stats.bump_version(db, stats.CATALOG_VERSION)
         await db.commit()
+        catalog_cache.expire()
         await db.refresh(db_book)
+        _publish_book("book.updated", db_book)
     return db_book
 
 async def delete_book(db: AsyncSession, book_id: int):
     db_book = await get_book(db, book_id)
     if db_book:
         await db.delete(db_book)
+        await stats.bump(db, books_total=-1, **stats.book_status_deltas(old_status=db_book.status))
+        await stats.bump_titles(db, _copy_deltas([(db_book.title_id, db_book.status, -1)]))
+        await stats.bump_version(db, stats.CATALOG_VERSION)
         await db.commit()
+        catalog_cache.expire()
+        events.publish("book.deleted", {"id": db_book.id})
     return db_book
 
+# Titles (the catalog; copies are Books)
+async def get_title(db: AsyncSession, title_id: int):
+    result = await db.execute(select(models.Title).where(models.Title.id == title_id))
+    return result.scalars().first()
+
+async def get_titles(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, columns: Optional[list] = None):
+    result = await db.execute(_page(_entities_or_columns(models.Title, columns), models.Title, skip, limit, after_id))
+    return _all(result, columns)
+
+async def get_available_titles(db: AsyncSession, columns: Optional[list] = None):
+    result = await db.execute(
+        _entities_or_columns(models.Title, columns).where(models.Title.available_copies > 0).order_by(models.Title.id)
+    )
+    return _all(result, columns)
+
+async def search_titles(db: AsyncSession, q: str, limit: int = 20):
+    return await _search(db, models.Title, q, limit)
+
+async def get_title_copies(db: AsyncSession, title_id: int):
+    result = await db.execute(select(models.Book).where(models.Book.title_id == title_id).order_by(models.Book.id))
+    return result.scalars().all()
+
 # CRUD for Members (Users with role MEMBER)
 async def get_member(db: AsyncSession, member_id: int):
     result = await db.execute(select(models.User).where(models.User.id == member_id, models.User.role == "MEMBER"))
     return result.scalars().first()
 
-async def get_members(db: AsyncSession, skip: int = 0, limit: int = 100, active: bool = True):
-    result = await db.execute(select(models.User).where(models.User.role == "MEMBER", models.User.is_active == active).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_members(db: AsyncSession, skip: int = 0, limit: int = 100, active: bool = True, after_id: Optional[int] = None, columns: Optional[list] = None):
+    query = _entities_or_columns(models.User, columns).where(models.User.role == "MEMBER", models.User.is_active == active)
+    result = await db.execute(_page(query, models.User, skip, limit, after_id))
+    return _all(result, columns)
 
 async def create_member(db: AsyncSession, user: schemas.UserCreate):
     user.role = "MEMBER"
@@ -91,54 +245,185 @@ async def create_member(db: AsyncSession, user: schemas.UserCreate):
 async def update_member(db: AsyncSession, member_id: int, user: schemas.UserCreate):
     db_member = await get_member(db, member_id)
     if db_member:
+        old_username = db_member.username
         db_member.username = user.username
+        was_member = db_member.role == "MEMBER"
         if user.password:
-            db_member.password_hash = get_password_hash(user.password)
+            db_member.password_hash = await get_password_hash(user.password)
         db_member.role = user.role.upper()
         db.add(db_member)
+        if was_member and db_member.role != "MEMBER":
+            await stats.bump(db, **{stats.member_counter(db_member.is_active): -1})
+        await stats.bump_version(db, stats.USERS_VERSION)
         await db.commit()
         await db.refresh(db_member)
+        user_cache.invalidate(old_username, db_member.username)
+        _publish_member("member.updated", db_member)
     return db_member
 
 async def delete_member(db: AsyncSession, member_id: int):
     db_member = await get_member(db, member_id)
     if db_member:
+        if db_member.is_active:
+            await stats.bump(db, members_active=-1, members_deleted=1)
         db_member.is_active = False
         db.add(db_member)
+        await stats.bump_version(db, stats.USERS_VERSION)
         await db.commit()
+        user_cache.invalidate(db_member.username)
+        _publish_member("member.deleted", db_member)
     return db_member
 
+# Borrowing history
+# Closed loans past the archive horizon live in history_archive (see app.archive);
+# ranges reaching back into it read both tables, newer ranges only the hot one.
+def _history_rows(model, member_id: Optional[int], since: Optional[datetime], until: Optional[datetime]):
+    query = (
+        select(
+            model.id.label("id"),
+            model.book_id.label("book_id"),
+            model.member_id.label("member_id"),
+            model.issue_date.label("issue_date"),
+            model.return_date.label("return_date"),
+        )
+        .join(models.Book, models.Book.id == model.book_id)
+        .join(models.User, models.User.id == model.member_id)
+    )
+    if member_id is not None:
+        query = query.where(model.member_id == member_id)
+    if since is not None:
+        query = query.where(model.issue_date >= since)
+    if until is not None:
+        query = query.where(model.issue_date < until)
+    return query
+
+def history_query(member_id: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None, include_archive: bool = False):
+    query = _history_rows(models.History, member_id, since, until)
+    if not include_archive:
+        return query.order_by(models.History.id)
+    combined = union_all(query, _history_rows(models.HistoryArchive, member_id, since, until))
+    return combined.order_by(combined.selected_columns.id)
+
+async def _needs_archive(db: AsyncSession, since: Optional[datetime]):
+    archived = await archive.archived_through(db)
+    return archived is not None and (since is None or since <= archived)
+
+async def get_history(db: AsyncSession, member_id: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    query = history_query(member_id, since, until, include_archive=await _needs_archive(db, since))
+    result = await db.execute(query)
+    return result.all()
+
+async def stream_history(db: AsyncSession, member_id: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None, batch_size: int = 1000):
+    query = history_query(member_id, since, until, include_archive=await _needs_archive(db, since))
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+# Active loans and loan totals
+def active_loans_query(member_id: int):
+    # Served from the partial ix_history_open_loans index, which only holds open
+    # loans, so the cost follows the number of books out, not the member's history
+    return (
+        select(models.Book.id.label("book_id"), models.Book.title, models.Book.author, models.History.issue_date)
+        .join(models.History, models.History.book_id == models.Book.id)
+        .where(models.History.member_id == member_id, models.History.return_date.is_(None))
+        .order_by(models.History.issue_date)
+    )
+
+async def get_active_loans(db: AsyncSession, member_id: int):
+    result = await db.execute(active_loans_query(member_id))
+    return result.all()
+
+async def get_member_summary(db: AsyncSession, member_id: int):
+    result = await db.execute(select(models.MemberSummary).where(models.MemberSummary.member_id == member_id))
+    return result.scalars().first()
+
 # Borrow and Return Books
+# Each is a single conditional UPDATE ... RETURNING over the requested ids, so the
+# availability check and the write happen atomically in the database; the History
+# writes share the transaction. Ids that don't match the condition are left untouched.
+async def _borrow(db: AsyncSession, copies, member_id: int):
+    result = await db.execute(
+        update(models.Book)
+        .where(copies, models.Book.status == "AVAILABLE")
+        .values(status="BORROWED", borrower_id=member_id)
+        .returning(models.Book)
+        .execution_options(populate_existing=True)
+    )
+    borrowed = result.scalars().all()
+    if not borrowed:
+        await db.rollback()
+        return []
+    issue_date = datetime.utcnow()
+    await db.execute(
+        insert(models.History),
+        [{"book_id": book.id, "member_id": member_id, "issue_date": issue_date} for book in borrowed],
+    )
+    await stats.bump(db, books_available=-len(borrowed), books_borrowed=len(borrowed))
+    await stats.bump_member(db, member_id, borrowed=len(borrowed), at=issue_date)
+    await stats.bump_titles(db, _availability_deltas(borrowed, -1))
+    await stats.bump_version(db, stats.CATALOG_VERSION)
+    await db.commit()
+    catalog_cache.expire()
+    for book in borrowed:
+        _publish_book("book.updated", book)
+    return borrowed
+
+async def borrow_books(db: AsyncSession, book_ids: list, member_id: int):
+    return await _borrow(db, models.Book.id.in_(book_ids), member_id)
+
+async def borrow_title(db: AsyncSession, title_id: int, member_id: int):
+    # Any free copy will do; SKIP LOCKED lets concurrent borrowers of one title take
+    # different copies on Postgres, and SQLite serializes the writers anyway
+    free_copy = (
+        select(models.Book.id)
+        .where(models.Book.title_id == title_id, models.Book.status == "AVAILABLE")
+        .order_by(models.Book.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    borrowed = await _borrow(db, models.Book.id == free_copy, member_id)
+    return borrowed[0] if borrowed else None
+
+async def return_books(db: AsyncSession, book_ids: list, member_id: int):
+    result = await db.execute(
+        update(models.Book)
+        .where(models.Book.id.in_(book_ids), models.Book.status == "BORROWED", models.Book.borrower_id == member_id)
+        .values(status="AVAILABLE", borrower_id=None)
+        .returning(models.Book)
+        .execution_options(populate_existing=True)
+    )
+    returned = result.scalars().all()
+    if not returned:
+        await db.rollback()
+        return []
+    # Close the open history records for the returned books
+    return_date = datetime.utcnow()
+    await db.execute(
+        update(models.History)
+        .where(
+            models.History.book_id.in_([book.id for book in returned]),
+            models.History.member_id == member_id,
+            models.History.return_date.is_(None),
+        )
+        .values(return_date=return_date)
+        .execution_options(synchronize_session=False)
+    )
+    await stats.bump(db, books_available=len(returned), books_borrowed=-len(returned))
+    await stats.bump_member(db, member_id, returned=len(returned), at=return_date)
+    await stats.bump_titles(db, _availability_deltas(returned, 1))
+    await stats.bump_version(db, stats.CATALOG_VERSION)
+    await db.commit()
+    catalog_cache.expire()
+    for book in returned:
+        _publish_book("book.updated", book)
+    return returned
+
 async def borrow_book(db: AsyncSession, book_id: int, member_id: int):
-    db_book = await get_book(db, book_id)
-    if db_book and db_book.status == "AVAILABLE":
-        db_book.status = "BORROWED"
-        db_book.borrower_id = member_id
-        history = models.History(book_id=book_id, member_id=member_id, issue_date=datetime.utcnow())
-        db.add(history)
-        db.add(db_book)
-        await db.commit()
-        await db.refresh(db_book)
-        return db_book
-    return None
+    borrowed = await borrow_books(db, [book_id], member_id)
+    return borrowed[0] if borrowed else None
 
 async def return_book(db: AsyncSession, book_id: int, member_id: int):
-    db_book = await get_book(db, book_id)
-    if db_book and db_book.status == "BORROWED" and db_book.borrower_id == member_id:
-        db_book.status = "AVAILABLE"
-        db_book.borrower_id = None
-        # Update the latest history record
-        result = await db.execute(
-            select(models.History)
-            .where(models.History.book_id == book_id, models.History.member_id == member_id, models.History.return_date == None)
-            .order_by(models.History.issue_date.desc())
-        )
-        history = result.scalars().first()
-        if history:
-            history.return_date = datetime.utcnow()
-            db.add(history)
-        db.add(db_book)
-        await db.commit()
-        await db.refresh(db_book)
-        return db_book
-    return None
+    returned = await return_books(db, [book_id], member_id)
+    return returned[0] if returned else None
@@ -1,6 +1,12 @@
+from fastapi import Request
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import hashlib
+import math
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,13 +15,78 @@ load_dotenv()
 # Use SQLite for database
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./library.db")
 
-# Create an SQLite engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Optional read replica for read-only endpoints; falls back to the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+# After a client writes, its reads stay on the primary this long to hide replica lag
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", 5))
+
+# Engine settings; SQL echo is expensive, so it is opt-in
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Connections each engine opens at startup, so first requests skip the connect; 0 disables
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", 2))
+
+# SQLite pragmas applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 30000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+def engine_options(url: str):
+    if url.startswith("sqlite"):
+        # SQLite has a single writer; queue on the busy timeout instead of failing fast
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def create_engine_for(url: str):
+    new_engine = create_async_engine(url, echo=DB_ECHO, **engine_options(url))
+    if url.startswith("sqlite"):
+        event.listen(new_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return new_engine
+
+engine = create_engine_for(DATABASE_URL)
+
+def lock_transaction(conn, postgres_lock: str):
+    # Call first thing inside run_sync on a fresh transaction. SQLite has one writer, so
+    # taking its write lock up front (BEGIN IMMEDIATE) serializes with every other
+    # writer; on Postgres the caller says what to lock, held until commit
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(postgres_lock)
+
+read_engine = create_engine_for(DATABASE_READ_URL) if DATABASE_READ_URL else engine
+
+async def prewarm(target, count: int = DB_POOL_PREWARM):
+    # Open the connections side by side, then hand them back to the pool; best effort
+    results = await asyncio.gather(*[target.connect() for _ in range(count)], return_exceptions=True)
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        await conn.close()
+    return len(opened)
 
 # Create sessionmaker with AsyncSession
 async_session = sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
 )
+async_read_session = sessionmaker(
+    read_engine, expire_on_commit=False, class_=AsyncSession
+) if DATABASE_READ_URL else async_session
 
 # Base class for models
 Base = declarative_base()
@@ -24,3 +95,67 @@ Base = declarative_base()
 async def get_db():
     async with async_session() as session:
         yield session
+
+# Read-your-writes. A successful write sets a short-lived cookie holding the time its
+# client's reads may go back to the replica; the cookie comes back to whichever worker
+# serves the next read. Clients that drop cookies are also remembered by a hash of their
+# Authorization header, but that map is per process, so it only covers reads that land
+# on the worker which served the write.
+READ_STICKY_COOKIE = "read_primary_until"
+
+_recent_writers = {}
+
+def _client_key(request):
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+def mark_write(request, response):
+    if async_read_session is async_session:
+        return
+    response.set_cookie(
+        READ_STICKY_COOKIE, f"{time.time() + READ_STICKY_SECONDS:.3f}",
+        max_age=math.ceil(READ_STICKY_SECONDS), httponly=True, samesite="lax",
+    )
+    key = _client_key(request)
+    if key is None:
+        return
+    now = time.monotonic()
+    _recent_writers[key] = now + READ_STICKY_SECONDS
+    if len(_recent_writers) > 10000:
+        for stale in [k for k, until in _recent_writers.items() if until <= now]:
+            del _recent_writers[stale]
+
+def _sticky_cookie(request):
+    try:
+        until = float(request.cookies.get(READ_STICKY_COOKIE, 0))
+    except ValueError:
+        return False
+    # A hand-made cookie can't pin a client to the primary for longer than a write would
+    now = time.time()
+    return now < until <= now + READ_STICKY_SECONDS
+
+def read_sessionmaker(request):
+    if _sticky_cookie(request):
+        return async_session
+    key = _client_key(request)
+    if key is not None and _recent_writers.get(key, 0) > time.monotonic():
+        return async_session
+    return async_read_session
+
+# Dependency to get a session for read-only endpoints
+async def get_read_db(request: Request):
+    async with read_sessionmaker(request)() as session:
+        yield session
+
+def pool_status(target=engine):
+    pool = target.pool
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    if "overflow" in status:
+        # QueuePool counts from -size until the pool is full; report only connections beyond it
+        status["overflow"] = max(0, status["overflow"])
+    return status
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import json
+import os
+import secrets
+from collections import deque
+
+# Change feed for the catalog and members. Write paths publish deltas after commit;
+# /events streams them to clients as server-sent events. The broker is in-process;
+# multi-worker deployments can swap in a shared backend with set_broker().
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 1000))
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", 1000))
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client fell too far behind; it will be told to reload instead
+            self.overflowed = True
+
+class InProcessBroker:
+    # Event ids are "<epoch>-<seq>": seq counts this broker's events and the epoch is
+    # new for every broker, so an id handed out by another worker or before a restart
+    # is recognised as foreign instead of being compared against the wrong sequence
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, replay_size: int = EVENTS_REPLAY_SIZE):
+        self.queue_size = queue_size
+        self.epoch = secrets.token_hex(4)
+        self._seqs = itertools.count(1)
+        self._last_seq = 0
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = set()
+
+    def publish(self, event_type: str, data: dict):
+        seq = next(self._seqs)
+        event = {"id": f"{self.epoch}-{seq}", "seq": seq, "type": event_type, "data": data}
+        self._last_seq = seq
+        self._recent.append(event)
+        for subscription in list(self._subscribers):
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def current_id(self):
+        # Id of the newest event published so far; everything after it is still to come
+        return f"{self.epoch}-{self._last_seq}"
+
+    def replay(self, last_event_id: str):
+        # Events after last_event_id, or None if they can't be told apart: already
+        # dropped, or the id isn't one this broker handed out
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._last_seq:
+            return None
+        seq = int(seq)
+        if seq == self._last_seq:
+            return []
+        if not self._recent or seq < self._recent[0]["seq"] - 1:
+            return None
+        return [event for event in self._recent if event["seq"] > seq]
+
+broker = InProcessBroker()
+
+def set_broker(new_broker):
+    global broker
+    broker = new_broker
+
+def publish(event_type: str, data: dict):
+    return broker.publish(event_type, data)
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+
+# bcrypt costs 100-300 ms per call, so it runs on a bounded worker pool
+# instead of the event loop. PASSWORD_HASH_WORKERS=0 hashes inline.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", PASSWORD_HASH_WORKERS * 8))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # 'thread' or 'process'
+
+_pwd_context = None
+
+def pwd_context():
+    # passlib and its bcrypt backend load on first use, not while a worker boots
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def _verify(plain_password, hashed_password):
+    return pwd_context().verify(plain_password, hashed_password)
+
+def _hash(password):
+    return pwd_context().hash(password)
+
+_executor = None
+_pending = 0
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+async def _run(func, *args):
+    global _pending
+    if PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        # Shed load early rather than queueing logins behind a full pool
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending -= 1
+
+async def verify_password(plain_password, hashed_password):
+    return await _run(_verify, plain_password, hashed_password)
+
+async def hash_password(password):
+    return await _run(_hash, password)
+
+def pending():
+    return _pending
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
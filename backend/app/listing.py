@@ -0,0 +1,29 @@
+from typing import Optional
+from fastapi import HTTPException, Request
+from .pagination import decode_cursor, next_cursor
+from .response_cache import catalog_cache, replica_settled
+from .serialization import dump_rows
+
+# Shared by the list endpoints. Pages carry an X-Next-Cursor header that the client
+# passes back as ?after= to fetch the next one.
+
+def parse_after(after: Optional[str]):
+    try:
+        return decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_headers(rows, limit: int):
+    cursor = next_cursor(rows, limit)
+    return {"X-Next-Cursor": cursor} if cursor else {}
+
+async def cached_listing(request: Request, db, schema, load, limit: Optional[int] = None):
+    # Catalog listings are cached per catalog version and carry an ETag; If-None-Match
+    # gets a 304. load() fetches the rows on a miss; pass limit for paged listings.
+    key = catalog_cache.key(request, await catalog_cache.current_version())
+    entry = catalog_cache.get(key)
+    if entry is None:
+        rows = await load()
+        headers = cursor_headers(rows, limit) if limit is not None else {}
+        entry = catalog_cache.put(key, dump_rows(schema, rows), headers, store=replica_settled(db))
+    return catalog_cache.respond(request, entry)
@@ -1,6 +1,12 @@
-from fastapi import FastAPI
-from .routers import auth, books, members
-from .database import engine, Base
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+import asyncio
+from .routers import auth, books, members, events, titles, stats as stats_router
+from .migrations import migrate
+from .user_cache import user_cache
+from .response_cache import catalog_cache
+from . import archive, hashing, metrics, rate_limit, stats
+from .database import engine, read_engine, pool_status, mark_write, prewarm
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(title="Library Management System API")
@@ -17,20 +23,88 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
+# Keep a client's reads on the primary for a moment after it writes.
+# Logging in is a POST but writes nothing; it must not pin every new session to the primary.
+NON_WRITING_ROUTES = {("POST", "/auth/login")}
+
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400
+            and (request.method, request.url.path) not in NON_WRITING_ROUTES):
+        mark_write(request, response)
+    return response
+
+# Per-route latency and per-request SQL statement counts for /metrics, measured
+# until the response body has been sent
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_engine(engine, "primary")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "replica")
+
 # Include Routers
 app.include_router(auth.router)
 app.include_router(books.router)
+app.include_router(titles.router)
 app.include_router(members.router)
+app.include_router(stats_router.router)
+app.include_router(events.router)
 
 # Root endpoint
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the Library Management System API"}
 
-# Initialize the database models at startup
+# Authenticated-user cache counters
+@app.get("/health/cache")
+async def read_cache_stats():
+    return {"user_cache": user_cache.stats(), "catalog_cache": catalog_cache.stats()}
+
+# Connection pool usage
+@app.get("/health/db")
+async def read_db_health():
+    health = {"primary": pool_status(engine)}
+    if read_engine is not engine:
+        health["replica"] = pool_status(read_engine)
+    return health
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    pools = [("primary", engine)] + ([("replica", read_engine)] if read_engine is not engine else [])
+    collected = {
+        "db_pool_checked_out": ("gauge", "Connections currently checked out of the pool", [
+            ({"engine": name}, pool_status(target).get("checkedout", 0)) for name, target in pools
+        ]),
+        "db_pool_overflow": ("gauge", "Connections opened beyond the pool size", [
+            ({"engine": name}, pool_status(target).get("overflow", 0)) for name, target in pools
+        ]),
+        "user_cache_hits_total": ("counter", "Authenticated-user cache hits", [({}, user_cache.hits)]),
+        "user_cache_misses_total": ("counter", "Authenticated-user cache misses", [({}, user_cache.misses)]),
+        "catalog_cache_hits_total": ("counter", "Catalog response cache hits", [({}, catalog_cache.hits)]),
+        "catalog_cache_misses_total": ("counter", "Catalog response cache misses", [({}, catalog_cache.misses)]),
+        "expensive_requests_in_flight": ("gauge", "Requests holding an expensive-route slot", [({}, rate_limit.active())]),
+    }
+    return PlainTextResponse(metrics.render(collected), media_type="text/plain; version=0.0.4")
+
+# Bring the database schema up to date and open pooled connections at startup
 @app.on_event("startup")
 async def startup_event():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate()
+    await asyncio.gather(*[prewarm(target) for target in {engine, read_engine}])
+    if stats.STATS_RECONCILE_SECONDS > 0:
+        app.state.reconcile_task = asyncio.create_task(stats.reconcile_periodically(engine))
+    if archive.HISTORY_ARCHIVE_SECONDS > 0:
+        app.state.archive_task = asyncio.create_task(archive.archive_periodically(engine))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    hashing.shutdown()
+    for name in ("reconcile_task", "archive_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
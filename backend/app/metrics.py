@@ -0,0 +1,173 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+
+# Per-route request latency, per-request SQL work and pool wait time, exposed
+# in the Prometheus text format at /metrics. No client library is needed.
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 0))  # 0 disables the slow-request log
+SLOW_REQUEST_MAX_STATEMENTS = 20
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_log = logging.getLogger("app.slow_requests")
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            counts, total, observations = self._series.get(label_values, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[label_values] = (counts, total + value, observations + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, observations) in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {observations}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {observations}")
+        return lines
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+request_statements = Histogram(
+    "db_statements_per_request", "SQL statements executed per request", ("method", "route"), COUNT_BUCKETS)
+request_db_time = Histogram(
+    "db_time_per_request_seconds", "Total SQL execution time per request", ("method", "route"))
+pool_wait = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("engine",))
+slow_requests = Counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", ("method", "route"))
+rejected_requests = Counter(
+    "http_rejected_requests_total", "Requests refused by rate limits or the concurrency cap", ("route", "reason"))
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.recent = []
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - context._metrics_started
+    stats.statements += 1
+    stats.db_time += elapsed
+    if SLOW_REQUEST_MS > 0 and len(stats.recent) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.recent.append((elapsed, statement))
+
+def instrument_engine(target, name: str):
+    sync_engine = target.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    pool = sync_engine.pool
+    checkout = pool._do_get
+
+    def timed_checkout():
+        started = time.perf_counter()
+        try:
+            return checkout()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, name)
+
+    # Wrap the pool's checkout on this instance only
+    pool._do_get = timed_checkout
+
+def record_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    request_latency.observe(elapsed, method, route, status)
+    request_statements.observe(stats.statements, method, route)
+    request_db_time.observe(stats.db_time, method, route)
+    if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+        slow_requests.inc(method, route)
+        statements = "\n".join(f"  {duration * 1000:.1f} ms  {statement}" for duration, statement in stats.recent)
+        slow_log.warning(
+            "slow request %s %s -> %s in %.1f ms, %d statements (%.1f ms in SQL)\n%s",
+            method, route, status, elapsed * 1000, stats.statements, stats.db_time * 1000, statements,
+        )
+
+class MetricsMiddleware:
+    # Plain ASGI rather than an http middleware: those return at the response headers,
+    # which for a StreamingResponse is before any of the body (and its SQL) has run.
+    # This records once the last body chunk is sent or the app fails.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_stats = RequestStats()
+        token = current_request.set(request_stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_watch(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_watch)
+        finally:
+            current_request.reset(token)
+            # Label by route template so /books/{book_id} stays a single series
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            record_request(scope["method"], route_path, status, time.perf_counter() - started, request_stats)
+
+def render(collected: dict = None):
+    # collected maps metric name -> (type, help, [(labels dict, value), ...]) read at scrape time
+    lines = []
+    for metric in (request_latency, request_statements, request_db_time, pool_wait, slow_requests, rejected_requests):
+        lines.extend(metric.render())
+    for name, (kind, help, samples) in (collected or {}).items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+from datetime import datetime
+import os
+from . import models
+from .database import Base, engine, lock_transaction
+from .search import create_search_index
+from . import stats
+
+# Ordered schema migrations, tracked in the schema_version table.
+# Append new steps to MIGRATIONS; never edit or reorder applied ones.
+
+# 'fast' trusts schema_version at startup and skips the migration pass (and its
+# write lock) when the schema is current; 'full' always runs the pass
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "fast")
+MIGRATION_LOCK_ID = 724011
+
+version_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+def _initial_schema(conn):
+    Base.metadata.create_all(conn)
+
+def _create_indexes(conn, table):
+    # Skips indexes over columns a later migration adds; that migration creates them
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for index in table.indexes:
+        if all(column.name in existing for column in index.columns):
+            index.create(conn, checkfirst=True)
+
+def _hot_path_indexes(conn):
+    # Tables created by create_all already have these; older databases get them here
+    for table in (models.User.__table__, models.Book.__table__, models.History.__table__):
+        _create_indexes(conn, table)
+
+def _counters(conn):
+    models.Counter.__table__.create(conn, checkfirst=True)
+    stats.reconcile(conn)
+
+def _member_summaries(conn):
+    models.MemberSummary.__table__.create(conn, checkfirst=True)
+    for index in models.History.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    # history_archive only exists from version 6 on
+    stats.reconcile_member_summaries(conn, include_archive=False)
+
+def _history_archive(conn):
+    models.HistoryArchive.__table__.create(conn, checkfirst=True)
+    # Version 5 created ix_history_open_loans on (member_id, issue_date) only
+    for index in models.History.__table__.indexes:
+        if index.name == "ix_history_open_loans":
+            index.drop(conn, checkfirst=True)
+            index.create(conn)
+
+def _titles(conn):
+    # Split the catalog into titles and copies: one title per distinct (title, author)
+    models.Title.__table__.create(conn, checkfirst=True)
+    if "title_id" not in {column["name"] for column in inspect(conn).get_columns("books")}:
+        conn.execute(text("ALTER TABLE books ADD COLUMN title_id INTEGER REFERENCES titles (id)"))
+    conn.execute(text(
+        "INSERT INTO titles (title, author, total_copies, available_copies) "
+        "SELECT DISTINCT title, author, 0, 0 FROM books b WHERE NOT EXISTS "
+        "(SELECT 1 FROM titles t WHERE t.title = b.title AND t.author = b.author)"
+    ))
+    conn.execute(text(
+        "UPDATE books SET title_id = (SELECT t.id FROM titles t WHERE t.title = books.title AND t.author = books.author) "
+        "WHERE title_id IS NULL"
+    ))
+    _create_indexes(conn, models.Book.__table__)
+    stats.reconcile_titles(conn)
+    create_search_index(conn, "titles")
+
+def _add_counter(conn, name):
+    # bump() only updates rows that exist
+    counters = models.Counter.__table__
+    if conn.execute(select(counters.c.name).where(counters.c.name == name)).first() is None:
+        conn.execute(counters.insert().values(name=name, value=0))
+
+def _catalog_version(conn):
+    _add_counter(conn, stats.CATALOG_VERSION)
+
+def _users_version(conn):
+    _add_counter(conn, stats.USERS_VERSION)
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "catalog full-text search index", create_search_index),
+    (3, "indexes for hot query predicates", _hot_path_indexes),
+    (4, "materialized availability counters", _counters),
+    (5, "per-member loan summaries", _member_summaries),
+    (6, "archive table for closed loans", _history_archive),
+    (7, "titles with multiple copies", _titles),
+    (8, "shared catalog cache version", _catalog_version),
+    (9, "shared user cache version", _users_version),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn):
+    version_metadata.create_all(conn)
+    versions = conn.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+def run_migrations(conn):
+    # Runs inside run_sync on a connection with an open transaction. Workers booting
+    # together queue on the lock instead of racing through the same steps; on SQLite
+    # it also keeps the DDL inside the transaction
+    lock_transaction(conn, f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_ID})")
+    applied = current_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version > applied:
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=version, description=description))
+    return max(applied, LATEST_VERSION)
+
+async def stored_version(engine=engine):
+    # One read, no DDL and no write transaction
+    try:
+        async with engine.connect() as conn:
+            return (await conn.execute(select(func.max(schema_version.c.version)))).scalar() or 0
+    except DBAPIError:
+        # No schema_version table yet
+        return 0
+
+async def migrate(engine=engine, full: bool = SCHEMA_CHECK == "full"):
+    if not full:
+        version = await stored_version(engine)
+        if version >= LATEST_VERSION:
+            return version
+    async with engine.begin() as conn:
+        return await conn.run_sync(run_migrations)
+
+if __name__ == "__main__":
+    # python -m app.migrations
+    import asyncio
+
+    print(f"schema at version {asyncio.run(migrate(engine, full=True))}")
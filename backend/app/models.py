@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -16,7 +16,31 @@ class User(Base):
     borrowed_books = relationship("Book", back_populates="borrower")
     history = relationship("History", back_populates="member")
 
+    __table_args__ = (
+        # Member listings: WHERE role = ? AND is_active = ? ORDER BY id
+        Index("ix_users_role_is_active_id", "role", "is_active", "id"),
+    )
+
+class Title(Base):
+    # A catalog entry; its physical copies are Book rows
+    __tablename__ = "titles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    author = Column(String, nullable=False)
+    total_copies = Column(Integer, nullable=False, default=0)
+    available_copies = Column(Integer, nullable=False, default=0)
+
+    copies = relationship("Book", back_populates="catalog_title")
+
+    __table_args__ = (
+        Index("ix_titles_title_author", "title", "author", unique=True),
+        # Available listing: WHERE available_copies > 0 ORDER BY id
+        Index("ix_titles_available_id", "id", sqlite_where=text("available_copies > 0"), postgresql_where=text("available_copies > 0")),
+    )
+
 class Book(Base):
+    # One physical copy; title and author are kept alongside title_id for the copy-level endpoints
     __tablename__ = "books"
     
     id = Column(Integer, primary_key=True, index=True)
@@ -24,9 +48,20 @@ class Book(Base):
     author = Column(String, nullable=False)
     status = Column(String, default="AVAILABLE")  # 'AVAILABLE' or 'BORROWED'
     borrower_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    title_id = Column(Integer, ForeignKey("titles.id"), nullable=True)
     
     borrower = relationship("User", back_populates="borrowed_books")
     history = relationship("History", back_populates="book")
+    catalog_title = relationship("Title", back_populates="copies")
+
+    __table_args__ = (
+        # Listings filtered by status: WHERE status = ? ORDER BY id
+        Index("ix_books_status_id", "status", "id"),
+        # Books currently lent to a member
+        Index("ix_books_borrower_id", "borrower_id", sqlite_where=text("borrower_id IS NOT NULL"), postgresql_where=text("borrower_id IS NOT NULL")),
+        # Allocating a free copy of a title: WHERE title_id = ? AND status = 'AVAILABLE' ORDER BY id
+        Index("ix_books_title_status_id", "title_id", "status", "id"),
+    )
 
 class History(Base):
     __tablename__ = "history"
@@ -39,3 +74,44 @@ class History(Base):
     
     book = relationship("Book", back_populates="history")
     member = relationship("User", back_populates="history")
+
+    __table_args__ = (
+        # Closing a loan: WHERE book_id = ? AND member_id = ? AND return_date IS NULL ORDER BY issue_date DESC
+        Index("ix_history_book_member_return", "book_id", "member_id", "return_date", "issue_date"),
+        # Per-member history and audit extracts by issue date
+        Index("ix_history_member_issue", "member_id", "issue_date"),
+        Index("ix_history_issue_date", "issue_date"),
+        # Active loans: one entry per book currently out, by member; return_date is
+        # in the key so the planner matches both predicates and prefers it
+        Index("ix_history_open_loans", "member_id", "return_date", "issue_date", "book_id", sqlite_where=text("return_date IS NULL"), postgresql_where=text("return_date IS NULL")),
+    )
+
+class HistoryArchive(Base):
+    # Closed loans moved out of history by app.archive; same columns and ids
+    __tablename__ = "history_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    book_id = Column(Integer, ForeignKey("books.id"))
+    member_id = Column(Integer, ForeignKey("users.id"))
+    issue_date = Column(DateTime)
+    return_date = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_history_archive_member_issue", "member_id", "issue_date"),
+        Index("ix_history_archive_issue_date", "issue_date"),
+    )
+
+class Counter(Base):
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class MemberSummary(Base):
+    __tablename__ = "member_summaries"
+
+    member_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_loans = Column(Integer, nullable=False, default=0)
+    active_loans = Column(Integer, nullable=False, default=0)
+    last_borrowed_at = Column(DateTime, nullable=True)
+    last_returned_at = Column(DateTime, nullable=True)
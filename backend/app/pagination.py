@@ -0,0 +1,25 @@
+import base64
+
+MAX_ID = 2**63 - 1
+
+# Opaque keyset cursors: the token wraps the id of the last row on a page,
+# and the next page is fetched with "WHERE id > :last_id ORDER BY id".
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> int:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        last_id = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    # Ids are 64-bit in every backend; a larger one would overflow the driver
+    if last_id < 0 or last_id > MAX_ID:
+        raise ValueError("Invalid cursor")
+    return last_id
+
+def next_cursor(rows, limit: int):
+    # A short page means there is nothing left to fetch
+    if limit <= 0 or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1].id)
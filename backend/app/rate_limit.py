@@ -0,0 +1,143 @@
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request, status
+from . import metrics
+from .auth import get_current_user
+
+# Admission control for the expensive routes: token buckets per client IP or per
+# authenticated user, plus a per-process cap on concurrent expensive requests.
+# Budgets are "requests/seconds"; an empty value disables that budget. Buckets live
+# in process memory by default; RATE_LIMIT_STORE=sqlite:///path shares them between
+# the workers on one host, and set_store() plugs in anything else with a take().
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/60")  # per client IP
+RATE_LIMIT_SIGNUP = os.getenv("RATE_LIMIT_SIGNUP", "5/60")  # per client IP
+RATE_LIMIT_HISTORY = os.getenv("RATE_LIMIT_HISTORY", "30/60")  # per user
+RATE_LIMIT_EXPORT = os.getenv("RATE_LIMIT_EXPORT", "10/60")  # per user
+EXPENSIVE_MAX_CONCURRENCY = int(os.getenv("EXPENSIVE_MAX_CONCURRENCY", 4))  # 0 disables the cap
+
+def parse_rate(rate: str):
+    # "10/60" -> bucket of 10 tokens refilling at 10 per 60 seconds
+    if not rate:
+        return None
+    requests, seconds = rate.split("/")
+    return int(requests), int(requests) / float(seconds)
+
+class MemoryStore:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: int, refill: float, now: float):
+        # Seconds until a token is available; 0 means this request took one
+        tokens, updated = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / refill
+        self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+class SqliteStore:
+    # Buckets in a local SQLite file, so every worker on the host draws from the same budget
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        self._lock = asyncio.Lock()
+
+    def _take(self, key: str, capacity: int, refill: float, now: float):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / refill
+            self._db.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens - 1 if tokens >= 1 else tokens, now),
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return wait
+
+    async def take(self, key: str, capacity: int, refill: float, now: float):
+        async with self._lock:
+            return await asyncio.to_thread(self._take, key, capacity, refill, now)
+
+def _create_store(spec: str):
+    if spec.startswith("sqlite:///"):
+        return SqliteStore(spec[len("sqlite:///"):])
+    return MemoryStore()
+
+store = _create_store(RATE_LIMIT_STORE)
+
+def set_store(new_store):
+    global store
+    store = new_store
+
+def client_ip(request: Request):
+    if RATE_LIMIT_TRUST_FORWARDED and request.headers.get("x-forwarded-for"):
+        return request.headers["x-forwarded-for"].split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def _check(route: str, key: str, rate):
+    capacity, refill = rate
+    wait = await store.take(f"{route}:{key}", capacity, refill, time.time())
+    if wait > 0:
+        metrics.rejected_requests.inc(route, "rate")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+def limit_by_ip(route: str, rate: str):
+    budget = parse_rate(rate)
+    async def dependency(request: Request):
+        if RATE_LIMIT_ENABLED and budget:
+            await _check(route, client_ip(request), budget)
+    return dependency
+
+def limit_by_user(route: str, rate: str):
+    # Shares the request's cached get_current_user, so authentication runs once
+    budget = parse_rate(rate)
+    async def dependency(current_user=Depends(get_current_user)):
+        if RATE_LIMIT_ENABLED and budget:
+            await _check(route, f"user:{current_user.id}", budget)
+    return dependency
+
+_active = 0
+
+def expensive(route: str):
+    # Held for the handler's lifetime; over the cap the request is refused, not queued
+    async def dependency():
+        global _active
+        if RATE_LIMIT_ENABLED and EXPENSIVE_MAX_CONCURRENCY > 0 and _active >= EXPENSIVE_MAX_CONCURRENCY:
+            metrics.rejected_requests.inc(route, "concurrency")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        _active += 1
+        try:
+            yield
+        finally:
+            _active -= 1
+    return dependency
+
+def active():
+    return _active
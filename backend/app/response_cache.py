@@ -0,0 +1,92 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from . import stats
+from .database import engine, READ_STICKY_SECONDS
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", 0.25))
+
+# Server-side cache of serialized catalog listings with strong ETags.
+# Entries are keyed by (path, query params, catalog version); every catalog
+# write bumps the version, so stale entries are simply never looked up again.
+# The version lives in the counters table and is bumped in the write's own
+# transaction, so all workers share it; each re-reads it from the primary at most
+# every CATALOG_VERSION_CHECK_SECONDS, which bounds how stale another worker's
+# entries can be served.
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, check_seconds: float = CATALOG_VERSION_CHECK_SECONDS):
+        self.maxsize = maxsize
+        self._version = stats.SharedVersion(engine, stats.CATALOG_VERSION, check_seconds)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def version(self):
+        return self._version.value
+
+    async def current_version(self):
+        return await self._version.current()
+
+    def expire(self):
+        # This worker just committed a catalog write; re-read the version on the next lookup
+        self._version.expire()
+
+    def settled(self, seconds: float):
+        return time.monotonic() - self._version.changed_at >= seconds
+
+    def key(self, request: Request, version: int):
+        return (request.url.path, tuple(sorted(request.query_params.multi_items())), version)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body: bytes, headers: dict = None, store: bool = True):
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = (body, etag, headers or {})
+        if store and self.maxsize > 0 and key[2] == self.version:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, request: Request, entry):
+        body, etag, headers = entry
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+catalog_cache = ResponseCache()
+
+def replica_settled(db):
+    # A replica may still lag a recent write; don't cache its answer under the new version
+    return db.bind is engine or catalog_cache.settled(READ_STICKY_SECONDS)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from .. import schemas, crud
 from ..database import get_db
+from ..rate_limit import limit_by_ip, RATE_LIMIT_LOGIN, RATE_LIMIT_SIGNUP
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -9,7 +10,7 @@ router = APIRouter(
     tags=["auth"],
 )
 
-@router.post("/signup", response_model=schemas.UserResponse)
+@router.post("/signup", response_model=schemas.UserResponse, dependencies=[Depends(limit_by_ip("signup", RATE_LIMIT_SIGNUP))])
 async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
@@ -22,12 +23,13 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("/login")
+# Budgeted per client IP: every attempt costs a bcrypt verify
+@router.post("/login", dependencies=[Depends(limit_by_ip("login", RATE_LIMIT_LOGIN))])
 async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     user = await crud.get_user_by_username(db, username=login_data.username)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    if not crud.verify_password(login_data.password, user.password_hash):
+    if not await crud.verify_password(login_data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
     # Generate JWT token
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from .. import schemas, crud, models
-from ..database import get_db
+from ..database import get_db, get_read_db, read_sessionmaker
+from ..bulk import iter_lines, parse_csv, parse_ndjson, to_csv, to_ndjson
+from ..listing import cached_listing, parse_after
+from ..serialization import schema_columns
+from ..rate_limit import expensive, limit_by_user, RATE_LIMIT_EXPORT
 from ..auth import get_current_active_librarian, get_current_active_member
-from datetime import datetime
+from functools import partial
+from typing import Optional
+import os
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 1000))
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", 1000))
+BATCH_MAX_BOOKS = int(os.getenv("BATCH_MAX_BOOKS", 100))
+
+BOOK_COLUMNS = schema_columns(models.Book, schemas.BookResponse)
 
 router = APIRouter(
     prefix="/books",
@@ -18,6 +31,49 @@ router = APIRouter(
 async def create_book(book: schemas.BookCreate, db: AsyncSession = Depends(get_db)):
     return await crud.create_book(db, book)
 
+# Import books from a streamed NDJSON or CSV body (Content-Type text/csv, or ?format=csv)
+@router.post("/bulk", response_model=schemas.BulkImportResult, dependencies=[Depends(get_current_active_librarian), Depends(expensive("bulk"))])
+async def bulk_import_books(request: Request, format: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        format = "csv" if "csv" in content_type else "ndjson"
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+    parse = parse_csv if format == "csv" else parse_ndjson
+
+    inserted, failed, errors, batch = 0, 0, [], []
+    async for line, book, error in parse(iter_lines(request.stream())):
+        if error:
+            failed += 1
+            if len(errors) < BULK_MAX_REPORTED_ERRORS:
+                errors.append(schemas.BulkImportError(line=line, error=error))
+            continue
+        batch.append(book)
+        if len(batch) >= BULK_BATCH_SIZE:
+            inserted += await crud.bulk_create_books(db, batch)
+            batch = []
+    inserted += await crud.bulk_create_books(db, batch)
+    return schemas.BulkImportResult(inserted=inserted, failed=failed, errors=errors)
+
+# Export the whole catalog as NDJSON or CSV
+@router.get("/export", dependencies=[Depends(get_current_active_librarian), Depends(limit_by_user("export", RATE_LIMIT_EXPORT)), Depends(expensive("export"))])
+async def export_books(request: Request, format: str = "ndjson"):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+
+    async def rows():
+        # The stream outlives the request's dependencies, so it owns its session
+        async with read_sessionmaker(request)() as db:
+            first = True
+            async for books in crud.stream_books(db, batch_size=BULK_BATCH_SIZE):
+                yield to_csv(books, header=first) if format == "csv" else to_ndjson(books)
+                first = False
+            if first and format == "csv":
+                yield to_csv([], header=True)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(rows(), media_type=media_type)
+
 # Update an existing book
 @router.put("/{book_id}", response_model=schemas.BookResponse, dependencies=[Depends(get_current_active_librarian)])
 async def update_book(book_id: int, book: schemas.BookUpdate, db: AsyncSession = Depends(get_db)):
@@ -34,72 +90,68 @@ async def delete_book(book_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Book not found")
     return db_book
 
-# View all books
+# View all books, a page at a time
 @router.get("/", response_model=list[schemas.BookResponse])
-async def read_books(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    books = await crud.get_books(db, skip=skip, limit=limit)
-    return books
+async def read_books(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    load = partial(crud.get_books, db, skip=skip, limit=limit, after_id=parse_after(after), columns=BOOK_COLUMNS)
+    return await cached_listing(request, db, schemas.BookResponse, load, limit=limit)
+
+# Search the catalog by title or author, best matches first
+@router.get("/search", response_model=list[schemas.BookResponse])
+async def search_books(q: str, limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+    return await crud.search_books(db, q, limit=limit)
 
 # Member Endpoints
 
 # View available books (those that are not borrowed)
 @router.get("/available", response_model=list[schemas.BookResponse], dependencies=[Depends(get_current_active_member)])
-async def read_available_books(db: AsyncSession = Depends(get_db)):
-    db_books = await db.execute(
-        db.query(models.Book)
-        .filter(models.Book.status == "AVAILABLE")
-    )
-    available_books = db_books.scalars().all()
-    return available_books
+async def read_available_books(request: Request, db: AsyncSession = Depends(get_read_db)):
+    load = partial(crud.get_available_books, db, columns=BOOK_COLUMNS)
+    return await cached_listing(request, db, schemas.BookResponse, load)
+
+def _batch_ids(batch: schemas.BookBatchRequest):
+    book_ids = list(dict.fromkeys(batch.book_ids))
+    if not book_ids:
+        raise HTTPException(status_code=400, detail="No books given")
+    if len(book_ids) > BATCH_MAX_BOOKS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_BOOKS} books per batch")
+    return book_ids
+
+def _batch_result(book_ids: list, books: list, failure: str):
+    done = {book.id: book for book in books}
+    return schemas.BookBatchResult(results=[
+        schemas.BookBatchItem(book_id=book_id, success=True, book=schemas.BookResponse.model_validate(done[book_id]))
+        if book_id in done else
+        schemas.BookBatchItem(book_id=book_id, success=False, detail=failure)
+        for book_id in book_ids
+    ])
+
+# Borrow several books in one transaction; each id gets its own result
+@router.post("/borrow", response_model=schemas.BookBatchResult, dependencies=[Depends(get_current_active_member)])
+async def borrow_books(batch: schemas.BookBatchRequest, current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
+    book_ids = _batch_ids(batch)
+    borrowed = await crud.borrow_books(db, book_ids, current_user.id)
+    return _batch_result(book_ids, borrowed, "Book not available for borrowing")
+
+# Return several books in one transaction
+@router.post("/return", response_model=schemas.BookBatchResult, dependencies=[Depends(get_current_active_member)])
+async def return_books(batch: schemas.BookBatchRequest, current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
+    book_ids = _batch_ids(batch)
+    returned = await crud.return_books(db, book_ids, current_user.id)
+    return _batch_result(book_ids, returned, "You cannot return a book that is not borrowed by you")
 
 # Borrow a book
 @router.post("/borrow/{book_id}", response_model=schemas.BookResponse, dependencies=[Depends(get_current_active_member)])
 async def borrow_book(book_id: int, current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
-    db_book = await db.get(models.Book, book_id)
-    
-    if db_book and db_book.status == "AVAILABLE":
-        db_book.status = "BORROWED"
-        db_book.borrower_id = current_user.id
-        
-        # Create a history entry
-        history = models.History(book_id=db_book.id, member_id=current_user.id, issue_date=datetime.utcnow())
-        db.add(history)
-        db.add(db_book)
-        await db.commit()
-        await db.refresh(db_book)
-        
-        return db_book
-    else:
+    db_book = await crud.borrow_book(db, book_id, current_user.id)
+    if not db_book:
         raise HTTPException(status_code=400, detail="Book not available for borrowing")
+    return db_book
 
 # Return a book
 @router.post("/return/{book_id}", response_model=schemas.BookResponse, dependencies=[Depends(get_current_active_member)])
 async def return_book(book_id: int, current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
-    db_book = await db.get(models.Book, book_id)
-    
-    if db_book and db_book.status == "BORROWED" and db_book.borrower_id == current_user.id:
-        db_book.status = "AVAILABLE"
-        db_book.borrower_id = None
-
-        # Find the latest history record using join
-        db_history = await db.execute(
-            db.query(models.History)
-            .join(models.Book)
-            .filter(models.History.book_id == db_book.id)
-            .filter(models.History.member_id == current_user.id)
-            .filter(models.History.return_date.is_(None))
-        )
-        history_record = db_history.scalars().first()
-        
-        # Update the return date
-        if history_record:
-            history_record.return_date = datetime.utcnow()
-            db.add(history_record)
-        
-        db.add(db_book)
-        await db.commit()
-        await db.refresh(db_book)
-        
-        return db_book
-    else:
+    db_book = await crud.return_book(db, book_id, current_user.id)
+    if not db_book:
         raise HTTPException(status_code=400, detail="You cannot return a book that is not borrowed by you")
+    return db_book
@@ -0,0 +1,82 @@
+import asyncio
+import os
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from .. import events
+from ..auth import get_current_user
+from ..database import async_session
+
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"],
+)
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+async def _authenticate(authorization: Optional[str], token: Optional[str]):
+    # EventSource can't send headers, so the token may also come as ?token=
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    async with async_session() as db:
+        user = await get_current_user(token=token, db=db)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+# Stream book and member changes as server-sent events. A first connection starts with
+# a ready event whose id marks the subscription: a client that loads the catalog after
+# it and then applies the deltas that follow misses nothing. Reconnecting clients send
+# Last-Event-ID and get the deltas they missed, or a resync event if those are gone.
+@router.get("")
+async def stream_events(request: Request, token: Optional[str] = None, authorization: Optional[str] = Header(None), last_event_id: Optional[str] = Header(None)):
+    user = await _authenticate(authorization, token)
+    # Member changes are for librarians only
+    prefixes = ("book.", "books.", "member.") if user.role == "LIBRARIAN" else ("book.", "books.")
+
+    # Subscribed before the response starts, so nothing published from here on is missed
+    subscription = events.broker.subscribe()
+    subscribed_at = events.broker.current_id()
+
+    async def stream():
+        # Sequence of the newest event written; the subscription may also hold replayed ones
+        last_sent = 0
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id is None:
+                yield events.format_sse({"id": subscribed_at, "type": "ready", "data": {}})
+            else:
+                missed = events.broker.replay(last_event_id)
+                if missed is None:
+                    yield RESYNC
+                else:
+                    for event in missed:
+                        if event["type"].startswith(prefixes):
+                            yield events.format_sse(event)
+                        last_sent = event["seq"]
+            while True:
+                if subscription.overflowed:
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    yield RESYNC
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if event["seq"] <= last_sent:
+                    continue
+                last_sent = event["seq"]
+                if event["type"].startswith(prefixes):
+                    yield events.format_sse(event)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from .. import schemas, crud, models
-from ..database import get_db
+from ..database import get_db, get_read_db, read_sessionmaker
+from ..listing import cursor_headers, parse_after
+from ..serialization import dump_rows, schema_columns
+from ..rate_limit import expensive, limit_by_user, RATE_LIMIT_HISTORY
 from ..auth import get_current_active_librarian, get_current_active_member
+from typing import Optional
+from datetime import datetime
 
 router = APIRouter(
     prefix="/members",
@@ -36,42 +42,82 @@ async def delete_member(member_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Member not found")
     return db_member
 
+MEMBER_COLUMNS = schema_columns(models.User, schemas.UserResponse)
+
+def _json(body: bytes, headers: Optional[dict] = None):
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _page_members(db: AsyncSession, skip: int, limit: int, active: bool, after: Optional[str]):
+    members = await crud.get_members(db, skip=skip, limit=limit, active=active, after_id=parse_after(after), columns=MEMBER_COLUMNS)
+    return _json(dump_rows(schemas.UserResponse, members), cursor_headers(members, limit))
+
 # View all active members
 @router.get("/", response_model=list[schemas.UserResponse], dependencies=[Depends(get_current_active_librarian)])
-async def read_members(skip: int = 0, limit: int = 100, active: bool = True, db: AsyncSession = Depends(get_db)):
-    members = await crud.get_members(db, skip=skip, limit=limit, active=active)
-    return members
+async def read_members(skip: int = 0, limit: int = 100, active: bool = True, after: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    return await _page_members(db, skip, limit, active, after)
 
 # View deleted members
 @router.get("/deleted", response_model=list[schemas.UserResponse], dependencies=[Depends(get_current_active_librarian)])
-async def read_deleted_members(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    members = await crud.get_members(db, skip=skip, limit=limit, active=False)
-    return members
-
-# View borrowing history of all members
-@router.get("/history", response_model=list[schemas.HistoryResponse], dependencies=[Depends(get_current_active_librarian)])
-async def read_members_history(db: AsyncSession = Depends(get_db)):
-    db_history = await db.execute(
-        db.query(models.History)
-        .join(models.Book)
-        .join(models.User)
-    )
-    history_records = db_history.scalars().all()
-    return history_records
+async def read_deleted_members(skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    return await _page_members(db, skip, limit, False, after)
+
+def _stream_history(request: Request, format: str, member_id: Optional[int], since: Optional[datetime], until: Optional[datetime]):
+    async def rows():
+        # The stream outlives the request's dependencies, so it owns its session
+        async with read_sessionmaker(request)() as db:
+            first = True
+            async for records in crud.stream_history(db, member_id=member_id, since=since, until=until):
+                chunk = [schemas.HistoryResponse.model_validate(record).model_dump_json() for record in records]
+                if format == "ndjson":
+                    yield "".join(line + "\n" for line in chunk)
+                else:
+                    yield ("[" if first else ",") + ",".join(chunk)
+                first = False
+            if format == "json":
+                yield "[]" if first else "]"
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(rows(), media_type=media_type)
+
+# View borrowing history of all members, optionally for one member and/or an issue-date range
+# ?format=json streams the same JSON array row by row, ?format=ndjson streams one record per line
+@router.get("/history", response_model=list[schemas.HistoryResponse], dependencies=[Depends(get_current_active_librarian), Depends(limit_by_user("history", RATE_LIMIT_HISTORY)), Depends(expensive("history"))])
+async def read_members_history(request: Request, member_id: Optional[int] = None, since: Optional[datetime] = None, until: Optional[datetime] = None, format: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    if format is not None:
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="Format must be json or ndjson")
+        return _stream_history(request, format, member_id, since, until)
+    history_records = await crud.get_history(db, member_id=member_id, since=since, until=until)
+    return _json(dump_rows(schemas.HistoryResponse, history_records))
+
+# Books a member currently has out, with their issue dates
+@router.get("/{member_id}/loans", response_model=list[schemas.ActiveLoan], dependencies=[Depends(get_current_active_librarian)])
+async def read_member_loans(member_id: int, db: AsyncSession = Depends(get_read_db)):
+    if not await crud.get_member(db, member_id):
+        raise HTTPException(status_code=404, detail="Member not found")
+    return await crud.get_active_loans(db, member_id)
 
 
 # Member Endpoints
 
 # View own borrowing history
-@router.get("/me/history", response_model=list[schemas.HistoryResponse], dependencies=[Depends(get_current_active_member)])
-async def read_my_history(current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
-    db_history = await db.execute(
-        db.query(models.History)
-        .join(models.Book)
-        .filter(models.History.member_id == current_user.id)
+@router.get("/me/history", response_model=list[schemas.HistoryResponse], dependencies=[Depends(get_current_active_member), Depends(limit_by_user("history", RATE_LIMIT_HISTORY))])
+async def read_my_history(current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_read_db)):
+    history_records = await crud.get_history(db, member_id=current_user.id)
+    return _json(dump_rows(schemas.HistoryResponse, history_records))
+
+# Own loan totals and the books currently out, read from the maintained summary
+@router.get("/me/summary", response_model=schemas.MemberSummaryResponse, dependencies=[Depends(get_current_active_member)])
+async def read_my_summary(current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_read_db)):
+    summary = await crud.get_member_summary(db, current_user.id)
+    return schemas.MemberSummaryResponse(
+        member_id=current_user.id,
+        total_loans=summary.total_loans if summary else 0,
+        active_loans=summary.active_loans if summary else 0,
+        last_borrowed_at=summary.last_borrowed_at if summary else None,
+        last_returned_at=summary.last_returned_at if summary else None,
+        loans=await crud.get_active_loans(db, current_user.id),
     )
-    history_records = db_history.scalars().all()
-    return history_records
 
 # Delete own account
 @router.delete("/me", response_model=schemas.UserResponse, dependencies=[Depends(get_current_active_member)])
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import stats
+from ..database import get_read_db, engine
+from ..auth import get_current_active_librarian
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+# Catalog and member counts for the dashboards, read from the counters table
+@router.get("/", dependencies=[Depends(get_current_active_librarian)])
+async def read_stats(db: AsyncSession = Depends(get_read_db)):
+    return await stats.read_counters(db)
+
+# Recount from the base tables now instead of waiting for the periodic job
+@router.post("/reconcile", dependencies=[Depends(get_current_active_librarian)])
+async def reconcile_stats():
+    return await stats.reconcile_all(engine)
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import schemas, crud, models
+from ..database import get_db, get_read_db
+from ..listing import cached_listing, parse_after
+from ..serialization import schema_columns
+from ..auth import get_current_active_librarian, get_current_active_member
+from functools import partial
+from typing import Optional
+import os
+
+TITLE_MAX_NEW_COPIES = int(os.getenv("TITLE_MAX_NEW_COPIES", 1000))
+
+TITLE_COLUMNS = schema_columns(models.Title, schemas.TitleResponse)
+
+router = APIRouter(
+    prefix="/titles",
+    tags=["titles"],
+)
+
+# The catalog by title: one row per (title, author) with its copy counts.
+# Copies are still Books, so the /books endpoints work on individual copies.
+
+# View all titles, a page at a time
+@router.get("/", response_model=list[schemas.TitleResponse])
+async def read_titles(request: Request, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    load = partial(crud.get_titles, db, skip=skip, limit=limit, after_id=parse_after(after), columns=TITLE_COLUMNS)
+    return await cached_listing(request, db, schemas.TitleResponse, load, limit=limit)
+
+# Search titles by title or author, best matches first
+@router.get("/search", response_model=list[schemas.TitleResponse])
+async def search_titles(q: str, limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+    return await crud.search_titles(db, q, limit=limit)
+
+# View titles with at least one copy on the shelf
+@router.get("/available", response_model=list[schemas.TitleResponse], dependencies=[Depends(get_current_active_member)])
+async def read_available_titles(request: Request, db: AsyncSession = Depends(get_read_db)):
+    load = partial(crud.get_available_titles, db, columns=TITLE_COLUMNS)
+    return await cached_listing(request, db, schemas.TitleResponse, load)
+
+# Librarian Endpoints
+
+# View the copies of a title
+@router.get("/{title_id}/copies", response_model=list[schemas.BookResponse], dependencies=[Depends(get_current_active_librarian)])
+async def read_title_copies(title_id: int, db: AsyncSession = Depends(get_read_db)):
+    if not await crud.get_title(db, title_id):
+        raise HTTPException(status_code=404, detail="Title not found")
+    return await crud.get_title_copies(db, title_id)
+
+# Add copies of a title
+@router.post("/{title_id}/copies", response_model=schemas.TitleResponse, dependencies=[Depends(get_current_active_librarian)])
+async def add_title_copies(title_id: int, copies: schemas.TitleCopiesCreate, db: AsyncSession = Depends(get_db)):
+    if not 1 <= copies.count <= TITLE_MAX_NEW_COPIES:
+        raise HTTPException(status_code=400, detail=f"Count must be between 1 and {TITLE_MAX_NEW_COPIES}")
+    db_title = await crud.get_title(db, title_id)
+    if not db_title:
+        raise HTTPException(status_code=404, detail="Title not found")
+    book = schemas.BookCreate(title=db_title.title, author=db_title.author)
+    await crud.bulk_create_books(db, [book] * copies.count)
+    await db.refresh(db_title)
+    return db_title
+
+# Member Endpoints
+
+# Borrow any free copy of a title
+@router.post("/{title_id}/borrow", response_model=schemas.BookResponse, dependencies=[Depends(get_current_active_member)])
+async def borrow_title(title_id: int, current_user: models.User = Depends(get_current_active_member), db: AsyncSession = Depends(get_db)):
+    db_title = await crud.get_title(db, title_id)
+    if not db_title:
+        raise HTTPException(status_code=404, detail="Title not found")
+    db_book = None
+    if db_title.available_copies > 0:
+        db_book = await crud.borrow_title(db, title_id, current_user.id)
+    if not db_book:
+        raise HTTPException(status_code=400, detail="No copy of this title is available for borrowing")
+    return db_book
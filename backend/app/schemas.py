@@ -37,6 +37,41 @@ class BookResponse(BookBase):
     class Config:
         from_attributes = True  
 
+# Title Schemas
+class TitleResponse(BookBase):
+    id: int
+    total_copies: int
+    available_copies: int
+
+    class Config:
+        from_attributes = True
+
+class TitleCopiesCreate(BaseModel):
+    count: int = 1
+
+# Batch borrow/return
+class BookBatchRequest(BaseModel):
+    book_ids: List[int]
+
+class BookBatchItem(BaseModel):
+    book_id: int
+    success: bool
+    book: Optional[BookResponse] = None
+    detail: Optional[str] = None
+
+class BookBatchResult(BaseModel):
+    results: List[BookBatchItem]
+
+# Bulk import report
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
 # History Schemas
 class HistoryResponse(BaseModel):
     id: int
@@ -47,7 +82,25 @@ class HistoryResponse(BaseModel):
 
     class Config:
         from_attributes = True  
-    
+
+# Loan Schemas
+class ActiveLoan(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    issue_date: datetime
+
+    class Config:
+        from_attributes = True
+
+class MemberSummaryResponse(BaseModel):
+    member_id: int
+    total_loans: int
+    active_loans: int
+    last_borrowed_at: Optional[datetime]
+    last_returned_at: Optional[datetime]
+    loans: List[ActiveLoan]
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,63 @@
+import re
+from sqlalchemy import text
+
+# Full-text catalog search over title and author, for the books (copies) and
+# titles tables. SQLite uses an external-content FTS5 table kept in sync by
+# triggers on the base table; Postgres uses a GIN expression index that needs no upkeep.
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+        title, author, content='{table}', content_rowid='id', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF title, author ON {table} BEGIN
+        INSERT INTO {table}_fts({table}_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO {table}_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+]
+
+POSTGRES_DDL = [
+    """CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table}
+        USING GIN (to_tsvector('simple', title || ' ' || author))""",
+]
+
+def create_search_index(conn, table: str = "books"):
+    # Runs inside run_sync at startup, after the tables exist
+    if conn.dialect.name == "sqlite":
+        exists = conn.exec_driver_sql(
+            f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{table}_fts'"
+        ).first()
+        for statement in SQLITE_DDL:
+            conn.exec_driver_sql(statement.format(table=table))
+        if not exists:
+            # Index rows that were in the table before the search table existed
+            conn.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            conn.exec_driver_sql(statement.format(table=table))
+
+def _terms(q: str):
+    return re.findall(r"\w+", q.lower())
+
+def search_query(dialect: str, q: str, limit: int, table: str = "books"):
+    terms = _terms(q)
+    if not terms:
+        return None
+    if dialect == "sqlite":
+        # Every term must match as a word prefix
+        match = " ".join(f'"{t}"*' for t in terms)
+        return text(
+            f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :match ORDER BY rank LIMIT :limit"
+        ).bindparams(match=match, limit=limit)
+    tsquery = " & ".join(f"{t}:*" for t in terms)
+    return text(
+        f"SELECT id FROM {table} "
+        "WHERE to_tsvector('simple', title || ' ' || author) @@ to_tsquery('simple', :tsquery) "
+        "ORDER BY ts_rank(to_tsvector('simple', title || ' ' || author), to_tsquery('simple', :tsquery)) DESC "
+        "LIMIT :limit"
+    ).bindparams(tsquery=tsquery, limit=limit)
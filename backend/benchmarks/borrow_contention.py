@@ -0,0 +1,99 @@
+# Fire many simultaneous borrows at a handful of books, returning every copy as soon
+# as it is lent so the books keep changing hands for the whole run, and check that no
+# copy is ever lent twice: every BORROWED book must have exactly one open loan and
+# every open loan a BORROWED book. Exits non-zero if the invariant breaks.
+#
+#   cd backend
+#   python -m benchmarks.borrow_contention --members 50 --books 5 --attempts 2000
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+from sqlalchemy import func, select
+from app import models
+from app.main import app
+from app.database import async_session
+
+async def run_handlers(handlers):
+    for handler in handlers:
+        await handler()
+
+async def login(client, username, role):
+    await client.post("/auth/signup", json={"username": username, "password": "pw", "role": role})
+    response = await client.post("/auth/login", json={"username": username, "password": "pw"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def main(args):
+    await run_handlers(app.router.on_startup)
+    # Count server errors (e.g. SQLite lock timeouts) instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        librarian = await login(client, "librarian", "LIBRARIAN")
+        book_ids = []
+        for i in range(args.books):
+            response = await client.post("/books/", json={"title": f"Contended {i}", "author": "Bench"}, headers=librarian)
+            book_ids.append(response.json()["id"])
+        members = [await login(client, f"member{i}", "MEMBER") for i in range(args.members)]
+
+        gate = asyncio.Semaphore(args.concurrency)
+        codes = {}
+        return_codes = {}
+
+        async def attempt(n):
+            # Consecutive attempts go to different books, so every book is contended at once
+            book_id = book_ids[n % len(book_ids)]
+            headers = members[(n // len(book_ids)) % len(members)]
+            async with gate:
+                response = await client.post(f"/books/borrow/{book_id}", headers=headers)
+                codes[response.status_code] = codes.get(response.status_code, 0) + 1
+                # Hand every book straight back; a lost race would leave an open loan
+                # behind that the final check finds
+                if response.status_code == 200:
+                    returned = await client.post(f"/books/return/{book_id}", headers=headers)
+                    return_codes[returned.status_code] = return_codes.get(returned.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(attempt(n) for n in range(args.attempts)))
+        elapsed = time.perf_counter() - started
+
+    async with async_session() as db:
+        open_loans = (await db.execute(
+            select(models.History.book_id, func.count())
+            .where(models.History.return_date.is_(None))
+            .group_by(models.History.book_id)
+        )).all()
+        borrowed = {book.id: book.borrower_id for book in (await db.execute(
+            select(models.Book).where(models.Book.status == "BORROWED")
+        )).scalars()}
+    await run_handlers(app.router.on_shutdown)
+
+    loans_per_book = dict(open_loans)
+    double_borrows = [(book_id, count) for book_id, count in open_loans if count > 1]
+    orphans = [book_id for book_id in loans_per_book if book_id not in borrowed]
+    unrecorded = [book_id for book_id in borrowed if book_id not in loans_per_book]
+    successful = codes.get(200, 0)
+    print(f"{args.attempts} borrow attempts on {args.books} books by {args.members} members in {elapsed:.2f}s: "
+          f"{successful} borrowed ({successful / elapsed:.0f} borrows/s), borrow status codes {codes}, "
+          f"return status codes {return_codes}")
+    print(f"books out: {len(borrowed)}, open loans: {sum(loans_per_book.values())}, "
+          f"double borrows: {len(double_borrows)}, loans without a borrowed book: {len(orphans)}, "
+          f"borrowed books without a loan: {len(unrecorded)}")
+    if double_borrows or orphans or unrecorded:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+# Check that the hot queries are planned against their indexes.
+# Prints EXPLAIN QUERY PLAN for each and exits non-zero if an expected index is unused.
+#
+#   cd backend
+#   python -m benchmarks.explain_plans
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+
+from sqlalchemy import select, update
+from app import crud, models
+from app.database import engine
+from app.migrations import migrate
+
+open_loans = (
+    update(models.History)
+    .where(models.History.book_id.in_([1, 2, 3]), models.History.member_id == 2, models.History.return_date.is_(None))
+    .values(return_date=datetime(2024, 1, 1))
+)
+
+free_copy = (
+    select(models.Book.id)
+    .where(models.Book.title_id == 1, models.Book.status == "AVAILABLE")
+    .order_by(models.Book.id)
+    .limit(1)
+)
+
+# (description, statement, index the plan must mention)
+PLANS = [
+    ("available books", select(models.Book).where(models.Book.status == "AVAILABLE").order_by(models.Book.id), "ix_books_status_id"),
+    ("active members", select(models.User).where(models.User.role == "MEMBER", models.User.is_active == True).order_by(models.User.id).limit(100), "ix_users_role_is_active_id"),
+    ("open loans on return", open_loans, "ix_history_book_member_return"),
+    ("member history", crud.history_query(member_id=2), "ix_history_member_issue"),
+    ("books lent to a member", select(models.Book).where(models.Book.borrower_id == 2), "ix_books_borrower_id"),
+    ("active loans of a member", crud.active_loans_query(2), "ix_history_open_loans"),
+    ("free copy of a title", free_copy, "ix_books_title_status_id"),
+    ("available titles", select(models.Title).where(models.Title.available_copies > 0).order_by(models.Title.id), "ix_titles_available_id"),
+]
+
+async def main():
+    await migrate(engine)
+    failures = 0
+    async with engine.connect() as conn:
+        for description, statement, index in PLANS:
+            compiled = statement.compile(engine.sync_engine, compile_kwargs={"literal_binds": True})
+            rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")).all()
+            plan = " | ".join(row[-1] for row in rows)
+            ok = index in plan
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {description}: {plan}")
+    await engine.dispose()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
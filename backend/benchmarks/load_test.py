@@ -0,0 +1,240 @@
+# Load test for the whole API: seeds users, books and history at a configurable
+# scale, drives a weighted mix of endpoints with concurrent clients, and reports
+# RPS and p50/p95/p99 per endpoint. Results can be saved as JSON and compared.
+#
+#   cd backend
+#   python -m benchmarks.load_test --books 100000 --members 2000 --history 500000
+#   python -m benchmarks.load_test --mode uvicorn --workers 4 --output after.json --compare before.json
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+from sqlalchemy import insert
+from app import hashing, models, stats
+from app.database import engine
+from app.main import app
+from app.migrations import migrate
+from benchmarks.report import compare, print_table, summarize
+
+PASSWORD = "load-test-password"
+SEED_BATCH = 5000
+
+# (endpoint name, weight)
+WORKLOAD = [
+    ("GET /books/", 25),
+    ("GET /books/available", 10),
+    ("GET /books/search", 10),
+    ("POST /books/borrow", 10),
+    ("GET /members/me/history", 10),
+    ("GET /members/history", 5),
+    ("GET /members/", 5),
+    ("GET /stats/", 3),
+    ("POST /auth/login", 2),
+]
+
+WORDS = ["history", "garden", "night", "river", "science", "winter", "empire", "shadow", "ocean", "code"]
+
+async def seed(args):
+    await migrate(engine)
+    password_hash = await hashing.hash_password(PASSWORD)
+    rng = random.Random(args.seed)
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.User), [
+            {"username": "librarian", "password_hash": password_hash, "role": "LIBRARIAN", "is_active": True}
+        ])
+        for start in range(0, args.members, SEED_BATCH):
+            await conn.execute(insert(models.User), [
+                {"username": f"member{i}", "password_hash": password_hash, "role": "MEMBER", "is_active": True}
+                for i in range(start, min(start + SEED_BATCH, args.members))
+            ])
+        # Each title gets up to --copies consecutive book rows; title ids follow insertion order
+        titles = [
+            (f"The {rng.choice(WORDS).title()} of {rng.choice(WORDS).title()} {i}", f"Author {i % 997}")
+            for i in range(-(-args.books // args.copies))
+        ]
+        for start in range(0, len(titles), SEED_BATCH):
+            await conn.execute(insert(models.Title), [
+                {"title": title, "author": author, "total_copies": 0, "available_copies": 0}
+                for title, author in titles[start:start + SEED_BATCH]
+            ])
+        for start in range(0, args.books, SEED_BATCH):
+            await conn.execute(insert(models.Book), [
+                {"title": titles[i // args.copies][0], "author": titles[i // args.copies][1],
+                 "title_id": i // args.copies + 1, "status": "AVAILABLE"}
+                for i in range(start, min(start + SEED_BATCH, args.books))
+            ])
+        now = datetime.utcnow()
+        for start in range(0, args.history, SEED_BATCH):
+            rows = []
+            for _ in range(start, min(start + SEED_BATCH, args.history)):
+                issued = now - timedelta(days=rng.uniform(1, 365 * 3))
+                rows.append({
+                    "book_id": rng.randint(1, args.books),
+                    "member_id": rng.randint(2, args.members + 1),
+                    "issue_date": issued,
+                    "return_date": issued + timedelta(days=rng.uniform(1, 30)),
+                })
+            await conn.execute(insert(models.History), rows)
+        await conn.run_sync(stats.reconcile)
+        await conn.run_sync(stats.reconcile_member_summaries)
+        await conn.run_sync(stats.reconcile_titles)
+
+async def login(client, username):
+    response = await client.post("/auth/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def run_client(client, n, args, member, librarian, deadline, samples, errors):
+    rng = random.Random(args.seed + n)
+    username = f"member{n % args.members}"
+    names = [name for name, _ in WORKLOAD]
+    weights = [weight for _, weight in WORKLOAD]
+
+    async def timed(name, method, url, headers=None, ok=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=headers)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = None
+        samples[name].append((time.perf_counter() - started) * 1000)
+        if status not in ok:
+            errors[name] += 1
+        return status
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        if name == "GET /books/":
+            await timed(name, "GET", f"/books/?skip={rng.randint(0, args.books)}&limit=100")
+        elif name == "GET /books/available":
+            await timed(name, "GET", "/books/available", member)
+        elif name == "GET /books/search":
+            await timed(name, "GET", f"/books/search?q={rng.choice(WORDS)[:rng.randint(3, 5)]}")
+        elif name == "POST /books/borrow":
+            book_id = rng.randint(1, args.books)
+            # A lost race for the same copy is an expected 400, not an error
+            if await timed(name, "POST", f"/books/borrow/{book_id}", member, ok=(200, 400)) == 200:
+                await timed("POST /books/return", "POST", f"/books/return/{book_id}", member)
+        elif name == "GET /members/me/history":
+            await timed(name, "GET", "/members/me/history", member)
+        elif name == "GET /members/history":
+            member_id = rng.randint(2, args.members + 1)
+            await timed(name, "GET", f"/members/history?member_id={member_id}", librarian)
+        elif name == "GET /members/":
+            await timed(name, "GET", "/members/?limit=100", librarian)
+        elif name == "GET /stats/":
+            await timed(name, "GET", "/stats/", librarian)
+        elif name == "POST /auth/login":
+            started = time.perf_counter()
+            response = await client.post("/auth/login", json={"username": username, "password": PASSWORD})
+            samples[name].append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors[name] += 1
+
+async def drive(client, args):
+    # Log everyone in up front; logins inside the mix are measured separately
+    librarian = await login(client, "librarian")
+    members = [await login(client, f"member{n % args.members}") for n in range(args.concurrency)]
+    names = [name for name, _ in WORKLOAD] + ["POST /books/return"]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        run_client(client, n, args, members[n], librarian, deadline, samples, errors) for n in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    return {name: summarize(samples[name], errors[name], elapsed) for name in names}
+
+def start_uvicorn(args):
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server = subprocess.Popen(command, cwd=backend_dir, env=os.environ.copy())
+    for _ in range(300):
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main(args):
+    started = time.perf_counter()
+    await seed(args)
+    print(f"seeded {args.members} members, {args.books} books ({-(-args.books // args.copies)} titles), {args.history} history rows "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.mode == "inprocess":
+        for handler in app.router.on_startup:
+            await handler()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            endpoints = await drive(client, args)
+        for handler in app.router.on_shutdown:
+            await handler()
+    else:
+        await engine.dispose()
+        server = start_uvicorn(args)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+                endpoints = await drive(client, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "uvicorn" else 1,
+        "database": engine.url.get_backend_name(),
+        "scale": {"members": args.members, "books": args.books, "history": args.history},
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "endpoints": endpoints,
+    }
+    print_table(endpoints)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database and load-test the API")
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--copies", type=int, default=3, help="book rows per title")
+    parser.add_argument("--history", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+# Event-loop latency of a cheap endpoint while a burst of logins is running.
+#
+#   cd backend
+#   python -m benchmarks.login_storm --logins 200
+#   PASSWORD_HASH_WORKERS=0 python -m benchmarks.login_storm   # inline bcrypt, for comparison
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+from app.main import app
+from app import hashing
+from benchmarks.report import percentile
+
+async def probe(client, stop, samples):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/")
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.005)
+
+async def measure(client, seconds):
+    samples, stop = [], asyncio.Event()
+    task = asyncio.create_task(probe(client, stop, samples))
+    await asyncio.sleep(seconds)
+    stop.set()
+    await task
+    return samples
+
+async def storm(client, logins, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    codes = {}
+
+    async def one():
+        async with gate:
+            response = await client.post("/auth/login", json={"username": "bench", "password": "bench-password"})
+            codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    return codes, time.perf_counter() - started
+
+async def run_handlers(handlers):
+    for handler in handlers:
+        await handler()
+
+async def main(args):
+    await run_handlers(app.router.on_startup)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/signup", json={"username": "bench", "password": "bench-password", "role": "MEMBER"})
+
+        idle = await measure(client, args.idle_seconds)
+
+        samples, stop = [], asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, samples))
+        codes, elapsed = await storm(client, args.logins, args.concurrency)
+        stop.set()
+        await probe_task
+    await run_handlers(app.router.on_shutdown)
+
+    print(f"hash workers={hashing.PASSWORD_HASH_WORKERS} executor={hashing.PASSWORD_HASH_EXECUTOR} "
+          f"max pending={hashing.PASSWORD_HASH_MAX_PENDING}")
+    print(f"logins: {args.logins} in {elapsed:.2f}s, status codes {codes}")
+    for label, data in (("idle", idle), ("during storm", samples)):
+        if data:
+            print(f"GET / {label:>12}: n={len(data):5d} p50={statistics.median(data):7.2f}ms "
+                  f"p99={percentile(data, 99):7.2f}ms max={max(data):7.2f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+# Read-replica routing check. The primary and the replica are two SQLite files; the
+# replica is a snapshot of the primary taken before a few more books were added, so
+# the number of books a listing returns shows which database answered it. Checks:
+#   - reads without a recent write go to the replica
+#   - after a write, that client's reads go to the primary for READ_STICKY_SECONDS,
+#     also on a worker that did not serve the write (the cookie, not process memory)
+#   - a replica answer given right after a catalog write is not cached
+# Exits non-zero if any check fails.
+#
+#   cd backend
+#   python -m benchmarks.read_replica
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+DB_DIR = tempfile.mkdtemp()
+PRIMARY_PATH = os.path.join(DB_DIR, "primary.db")
+REPLICA_PATH = os.path.join(DB_DIR, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{PRIMARY_PATH}"
+os.environ["DATABASE_READ_URL"] = f"sqlite+aiosqlite:///{REPLICA_PATH}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import httpx
+from sqlalchemy import insert
+from app import crud, models, schemas, stats
+from app.database import READ_STICKY_COOKIE, _recent_writers, async_session, engine
+from app.main import app
+from app.migrations import migrate
+from app.response_cache import catalog_cache
+
+PASSWORD = "replica-check-password"
+SNAPSHOT_BOOKS = 20
+PRIMARY_ONLY_BOOKS = 3
+
+async def seed():
+    await migrate(engine)
+    async with async_session() as db:
+        for username, role in (("librarian", "LIBRARIAN"), ("member", "MEMBER")):
+            await crud.create_user(db, schemas.UserCreate(username=username, password=PASSWORD, role=role))
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Book), [
+            {"title": f"Snapshot {i}", "author": "Author", "status": "AVAILABLE"} for i in range(SNAPSHOT_BOOKS)
+        ])
+        await conn.run_sync(stats.reconcile)
+    await engine.dispose()
+    # The replica stops here; everything after this exists on the primary only
+    with sqlite3.connect(PRIMARY_PATH) as source, sqlite3.connect(REPLICA_PATH) as target:
+        source.backup(target)
+    async with async_session() as db:
+        for i in range(PRIMARY_ONLY_BOOKS - 1):
+            await crud.create_book(db, schemas.BookCreate(title=f"Primary only {i}", author="Author"))
+
+async def login(client, username):
+    response = await client.post("/auth/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def count_books(client, headers, query):
+    response = await client.get(f"/books/?limit=1000&{query}", headers=headers)
+    response.raise_for_status()
+    return len(response.json())
+
+async def main():
+    await seed()
+    replica, primary = SNAPSHOT_BOOKS, SNAPSHOT_BOOKS + PRIMARY_ONLY_BOOKS
+    failures = 0
+
+    def check(name, ok, detail):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as member_client, \
+            httpx.AsyncClient(transport=transport, base_url="http://check") as librarian_client:
+        member = await login(member_client, "member")
+        librarian = await login(librarian_client, "librarian")
+
+        seen = await count_books(member_client, member, "check=replica")
+        check("reads go to the replica", seen == replica, f"{seen} books, replica has {replica}")
+        # crud.create_book just moved the catalog version; the replica may not have caught up
+        check("replica answer not cached", catalog_cache.stats()["size"] == 0,
+              f"{catalog_cache.stats()['size']} cached entries")
+
+        response = await librarian_client.post("/books/", json={"title": "Written now", "author": "Author"}, headers=librarian)
+        response.raise_for_status()
+        check("write sets the sticky cookie", READ_STICKY_COOKIE in librarian_client.cookies,
+              f"cookies {sorted(librarian_client.cookies.keys())}")
+        seen = await count_books(librarian_client, librarian, "check=sticky")
+        check("writer reads the primary", seen == primary, f"{seen} books, primary has {primary}")
+
+        # Another worker never saw the write; only the cookie carries it there
+        _recent_writers.clear()
+        seen = await count_books(librarian_client, librarian, "check=sticky-other-worker")
+        check("writer reads the primary on another worker", seen == primary, f"{seen} books, primary has {primary}")
+
+        seen = await count_books(member_client, member, "check=replica-again")
+        check("other clients still read the replica", seen == replica, f"{seen} books, replica has {replica}")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
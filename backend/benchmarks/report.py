@@ -0,0 +1,42 @@
+import json
+import statistics
+
+# Latency summaries shared by the benchmark scripts; samples are in milliseconds.
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(samples, errors: int, elapsed: float):
+    if not samples:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "p99_ms": round(percentile(samples, 99), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+def print_table(endpoints: dict):
+    print(f"{'endpoint':<28}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, row in sorted(endpoints.items()):
+        print(f"{name:<28}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9}"
+              f"{row.get('p50_ms', '-'):>9}{row.get('p95_ms', '-'):>9}{row.get('p99_ms', '-'):>9}")
+
+def compare(current: dict, baseline_path: str):
+    # Print per-endpoint RPS and p99 changes against an earlier results file
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline_path} ({baseline.get('commit', 'unknown commit')})")
+    print(f"{'endpoint':<28}{'rps':>18}{'p99 ms':>20}")
+    for name, row in sorted(current["endpoints"].items()):
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or not before.get("requests") or not row.get("requests"):
+            continue
+        rps_change = (row["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        p99_change = (row["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100 if before["p99_ms"] else 0.0
+        print(f"{name:<28}{before['rps']:>8} -> {row['rps']:<6}{rps_change:+4.0f}%"
+              f"{before['p99_ms']:>9} -> {row['p99_ms']:<6}{p99_change:+4.0f}%")
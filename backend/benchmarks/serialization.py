@@ -0,0 +1,122 @@
+# Compare the list-endpoint serialization paths on seeded data:
+#   pydantic  ORM instances validated through the response schema, then dumped (the response_model path)
+#   stdlib    column tuples dumped with json, the fallback when orjson is not installed
+#   orjson    column tuples dumped with orjson
+# Exits non-zero if any fast path output differs from what response_model produces.
+#
+#   cd backend
+#   python -m benchmarks.serialization --rows 1000 --repeat 50
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from app import crud, models, schemas, serialization
+from app.database import engine, async_session
+from app.migrations import migrate
+from app.serialization import dump_rows, schema_columns
+
+async def seed(rows: int):
+    started = datetime(2024, 1, 1, 9, 30)
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.User), [
+            {"id": i, "username": f"member{i}", "password_hash": "x", "role": "MEMBER", "is_active": True}
+            for i in range(1, rows + 1)
+        ])
+        await conn.execute(insert(models.Book), [
+            {"id": i, "title": f"Título {i} \"quoted\"", "author": f"Author {i % 97}",
+             "status": "BORROWED" if i % 3 == 0 else "AVAILABLE", "borrower_id": i if i % 3 == 0 else None}
+            for i in range(1, rows + 1)
+        ])
+        await conn.execute(insert(models.History), [
+            {"id": i, "book_id": i, "member_id": i, "issue_date": started + timedelta(minutes=i, microseconds=i % 2 * 1500),
+             "return_date": None if i % 3 == 0 else started + timedelta(days=1, minutes=i)}
+            for i in range(1, rows + 1)
+        ])
+
+def response_model_body(schema, objects):
+    # What FastAPI does for response_model=list[schema]: validate, encode, JSONResponse.render
+    validated = TypeAdapter(list[schema]).validate_python(objects, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def endpoints(rows: int):
+    book_columns = schema_columns(models.Book, schemas.BookResponse)
+    member_columns = schema_columns(models.User, schemas.UserResponse)
+    return {
+        "books": (
+            schemas.BookResponse,
+            lambda db: crud.get_books(db, limit=rows),
+            lambda db: crud.get_books(db, limit=rows, columns=book_columns),
+        ),
+        "members": (
+            schemas.UserResponse,
+            lambda db: crud.get_members(db, limit=rows),
+            lambda db: crud.get_members(db, limit=rows, columns=member_columns),
+        ),
+        "history": (
+            schemas.HistoryResponse,
+            lambda db: _history_objects(db),
+            lambda db: crud.get_history(db),
+        ),
+    }
+
+async def _history_objects(db):
+    # The ORM entity query history endpoints ran before the column select
+    result = await db.execute(select(models.History).order_by(models.History.id))
+    return result.scalars().all()
+
+async def timed(repeat: int, run):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = await run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return body, samples
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    await migrate(engine)
+    await seed(args.rows)
+    paths = ["pydantic", "stdlib"] + (["orjson"] if serialization.orjson is not None else [])
+    print(f"{args.rows} rows, {args.repeat} runs, query + serialization, median ms")
+    print(f"{'endpoint':<12}" + "".join(f"{path:>12}" for path in paths))
+    mismatches = 0
+    async with async_session() as db:
+        for name, (schema, load_objects, load_rows) in endpoints(args.rows).items():
+            async def pydantic_path():
+                return response_model_body(schema, await load_objects(db))
+            async def stdlib_path():
+                return dump_rows(schema, await load_rows(db), dumps=serialization.stdlib_dumps)
+            async def orjson_path():
+                return dump_rows(schema, await load_rows(db), dumps=serialization.orjson.dumps)
+            runs = {"pydantic": pydantic_path, "stdlib": stdlib_path, "orjson": orjson_path}
+            expected, medians = None, []
+            for path in paths:
+                body, samples = await timed(args.repeat, runs[path])
+                if expected is None:
+                    expected = body
+                elif body != expected:
+                    mismatches += 1
+                    print(f"MISMATCH {name} {path}: {body[:120]!r} != {expected[:120]!r}")
+                medians.append(statistics.median(samples))
+            print(f"{name:<12}" + "".join(f"{median:>12.2f}" for median in medians))
+    await engine.dispose()
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
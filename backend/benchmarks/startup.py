@@ -0,0 +1,98 @@
+# Worker cold-start time. Boots N worker processes at once against one database,
+# as a multi-worker rollout does, and reports per worker how long the app import,
+# the startup handlers (schema check, pool prewarm) and the first request took.
+# Each scenario runs with an empty database and with one already at the latest schema.
+#
+#   cd backend
+#   python -m benchmarks.startup --workers 8
+#   SCHEMA_CHECK=full python -m benchmarks.startup   # always run the migration pass, for comparison
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ["import_ms", "startup_ms", "first_request_ms", "total_ms"]
+
+def probe():
+    # Runs in each worker process; prints one JSON line of phase timings
+    import asyncio
+
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    async def boot():
+        import httpx
+
+        for handler in app.router.on_startup:
+            await handler()
+        booted = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://probe") as client:
+            status = (await client.get("/books/?limit=10")).status_code
+        served = time.perf_counter()
+        for handler in app.router.on_shutdown:
+            await handler()
+        return booted, served, status
+
+    booted, served, status = asyncio.run(boot())
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (booted - imported) * 1000,
+        "first_request_ms": (served - booted) * 1000,
+        "total_ms": (served - started) * 1000,
+        "status": status,
+    }))
+
+def boot_workers(count: int, database_url: str):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "DATABASE_URL": database_url, "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+           "STATS_RECONCILE_SECONDS": "0", "HISTORY_ARCHIVE_SECONDS": "0"}
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.startup", "--probe"], cwd=backend_dir, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(count)
+    ]
+    results, failures = [], 0
+    for worker in workers:
+        out, err = worker.communicate()
+        lines = out.strip().splitlines()
+        if worker.returncode != 0 or not lines:
+            failures += 1
+            print(f"worker failed: {err.strip().splitlines()[-1] if err.strip() else worker.returncode}")
+            continue
+        result = json.loads(lines[-1])
+        failures += result["status"] != 200
+        results.append(result)
+    return results, failures
+
+def report(scenario: str, results: list, failures: int):
+    cells = []
+    for phase in PHASES:
+        samples = [result[phase] for result in results]
+        cells.append(f"{statistics.median(samples):>9.0f}{max(samples):>7.0f}" if samples else f"{'-':>9}{'-':>7}")
+    print(f"{scenario:<16}{len(results):>8}{failures:>7}" + "".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.probe:
+        probe()
+        return
+
+    database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    print(f"{args.workers} workers booting together, SCHEMA_CHECK={os.environ.get('SCHEMA_CHECK', 'fast')}; "
+          "p50 and max ms per phase")
+    print(f"{'scenario':<16}{'workers':>8}{'failed':>7}" + "".join(f"{phase[:-3]:>16}" for phase in PHASES))
+    # The first round migrates the empty database, the second finds it current
+    for scenario in ("empty database", "current schema"):
+        results, failures = boot_workers(args.workers, database_url)
+        report(scenario, results, failures)
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,7 @@ async function login(username, password) {
 
 // Handle user logout
 function logout() {
+    unsubscribeFromChanges();
     removeAuthToken();
     alert("Logged out successfully!");
     loadLoginPage();
@@ -88,8 +89,10 @@ function loadDashboard() {
     if (isAuthenticated()) {
         document.getElementById("login-form").style.display = "none";
         document.getElementById("dashboard").style.display = "block";
-        fetchBooks();
+        fetchStats();
         fetchMembers();
+        // The catalog is loaded once the change feed is open, see subscribeToChanges
+        subscribeToChanges();
     } else {
         loadLoginPage();
     }
@@ -104,37 +107,161 @@ function loadLoginPage() {
 // Initialize dashboard or login page on page load
 window.onload = loadDashboard;
 
+// Dashboard counts (Librarians Only)
+async function fetchStats() {
+    const statsContainer = document.getElementById("stats-container");
+    if (!statsContainer) {
+        return;
+    }
+    try {
+        const stats = await apiRequest("/stats", "GET", null, true);
+        statsContainer.innerHTML = `
+            <p><strong>Books:</strong> ${stats.books_total}
+               (${stats.books_available} available, ${stats.books_borrowed} borrowed)</p>
+            <p><strong>Members:</strong> ${stats.members_active} active, ${stats.members_deleted} deleted</p>
+        `;
+    } catch (error) {
+        statsContainer.innerHTML = "";
+    }
+}
+
 // CRUD Operations for Books
+// Local copy of the catalog, kept current by the /events feed
+const catalog = new Map();
+// Results of the last server-side search, shown instead of the catalog; null when not searching
+let searchResults = null;
+
+// Render the local catalog copy
+function renderBooks() {
+    const booksContainer = document.getElementById("books-container");
+    if (!booksContainer) {
+        return;
+    }
+    booksContainer.innerHTML = ""; // Clear existing books
+
+    // Search hits are drawn from the catalog copy where possible, so pushed changes show up
+    const books = searchResults
+        ? searchResults.map((book) => catalog.get(book.id) || book)
+        : Array.from(catalog.values());
+    books.forEach((book) => {
+        const bookElement = document.createElement("div");
+        bookElement.className = "book-item";
+        bookElement.innerHTML = `
+            <p><strong>Title:</strong> ${book.title}</p>
+            <p><strong>Author:</strong> ${book.author}</p>
+            <p><strong>Status:</strong> ${book.status}</p>
+            <button onclick="deleteBook(${book.id})">Delete</button>
+            <button onclick="editBook(${book.id})">Edit</button>
+        `;
+        booksContainer.appendChild(bookElement);
+    });
+}
+
 // Fetch all books and display them
 async function fetchBooks() {
     try {
         const books = await apiRequest("/books", "GET", null, true);
-        const booksContainer = document.getElementById("books-container");
-        booksContainer.innerHTML = ""; // Clear existing books
-
-        books.forEach((book) => {
-            const bookElement = document.createElement("div");
-            bookElement.className = "book-item";
-            bookElement.innerHTML = `
-                <p><strong>Title:</strong> ${book.title}</p>
-                <p><strong>Author:</strong> ${book.author}</p>
-                <p><strong>Status:</strong> ${book.status}</p>
-                <button onclick="deleteBook(${book.id})">Delete</button>
-                <button onclick="editBook(${book.id})">Edit</button>
-            `;
-            booksContainer.appendChild(bookElement);
-        });
+        catalog.clear();
+        books.forEach((book) => catalog.set(book.id, book));
+        renderBooks();
     } catch (error) {
         alert("Failed to load books: " + error.message);
     }
 }
 
+// Apply book and member changes pushed by the server instead of re-polling
+let changeFeed = null;
+// Changes received while the catalog snapshot loads, applied after it; null once loaded
+let pendingChanges = [];
+
+// Read the catalog, then replay the changes that arrived meanwhile on top of it
+async function loadCatalog() {
+    pendingChanges = pendingChanges || [];
+    await fetchBooks();
+    const held = pendingChanges;
+    pendingChanges = null;
+    held.forEach((apply) => apply());
+}
+
+function subscribeToChanges() {
+    if (changeFeed || !isAuthenticated()) {
+        return;
+    }
+    if (!window.EventSource) {
+        fetchBooks();
+        return;
+    }
+    pendingChanges = [];
+    changeFeed = new EventSource(`${API_BASE_URL}/events?token=${encodeURIComponent(getAuthToken())}`);
+    const on = (type, apply) => {
+        changeFeed.addEventListener(type, (event) => {
+            if (pendingChanges) {
+                pendingChanges.push(() => apply(event));
+            } else {
+                apply(event);
+            }
+        });
+    };
+    const applyBook = (event) => {
+        const book = JSON.parse(event.data);
+        catalog.set(book.id, book);
+        renderBooks();
+    };
+    // Sent once the server has subscribed us: a snapshot read from here on misses nothing
+    changeFeed.addEventListener("ready", loadCatalog);
+    // Without a feed there is nothing to wait for; show the catalog anyway
+    changeFeed.onerror = () => {
+        if (pendingChanges && catalog.size === 0) {
+            fetchBooks();
+        }
+    };
+    on("book.created", applyBook);
+    on("book.updated", applyBook);
+    on("book.deleted", (event) => {
+        catalog.delete(JSON.parse(event.data).id);
+        renderBooks();
+    });
+    // Bulk imports and missed events mean the local copy must be reloaded
+    on("books.imported", fetchBooks);
+    on("resync", () => {
+        fetchBooks();
+        fetchMembers();
+    });
+    ["member.created", "member.updated", "member.deleted"].forEach((type) => {
+        on(type, fetchMembers);
+    });
+}
+
+function unsubscribeFromChanges() {
+    if (changeFeed) {
+        changeFeed.close();
+        changeFeed = null;
+    }
+}
+
+// Search books by title or author on the server; an empty query shows the whole catalog again
+async function searchBooks(query) {
+    if (!query.trim()) {
+        searchResults = null;
+        renderBooks();
+        return;
+    }
+    try {
+        searchResults = await apiRequest(`/books/search?q=${encodeURIComponent(query)}`, "GET", null, true);
+        renderBooks();
+    } catch (error) {
+        alert("Failed to search books: " + error.message);
+    }
+}
+
 // Add a new book
 async function addBook(title, author) {
     try {
         await apiRequest("/books", "POST", { title, author }, true);
         alert("Book added successfully!");
-        fetchBooks();
+        if (!changeFeed) {
+            fetchBooks(); // The change feed delivers the update otherwise
+        }
     } catch (error) {
         alert("Failed to add book: " + error.message);
     }
@@ -149,7 +276,9 @@ async function editBook(bookId) {
     try {
         await apiRequest(`/books/${bookId}`, "PUT", { title: newTitle, author: newAuthor, status: newStatus }, true);
         alert("Book updated successfully!");
-        fetchBooks();
+        if (!changeFeed) {
+            fetchBooks();
+        }
     } catch (error) {
         alert("Failed to update book: " + error.message);
     }
@@ -160,7 +289,9 @@ async function deleteBook(bookId) {
     try {
         await apiRequest(`/books/${bookId}`, "DELETE", null, true);
         alert("Book deleted successfully!");
-        fetchBooks();
+        if (!changeFeed) {
+            fetchBooks();
+        }
     } catch (error) {
         alert("Failed to delete book: " + error.message);
     }
@@ -195,7 +326,9 @@ async function addMember(username, password, role) {
     try {
         await apiRequest("/members", "POST", { username, password, role }, true);
         alert("Member added successfully!");
-        fetchMembers();
+        if (!changeFeed) {
+            fetchMembers();
+        }
     } catch (error) {
         alert("Failed to add member: " + error.message);
     }
@@ -209,7 +342,9 @@ async function editMember(memberId) {
     try {
         await apiRequest(`/members/${memberId}`, "PUT", { username: newUsername, password: newPassword }, true);
         alert("Member updated successfully!");
-        fetchMembers();
+        if (!changeFeed) {
+            fetchMembers();
+        }
     } catch (error) {
         alert("Failed to update member: " + error.message);
     }
@@ -220,7 +355,9 @@ async function deleteMember(memberId) {
     try {
         await apiRequest(`/members/${memberId}`, "DELETE", null, true);
         alert("Member deleted successfully!");
-        fetchMembers();
+        if (!changeFeed) {
+            fetchMembers();
+        }
     } catch (error) {
         alert("Failed to delete member: " + error.message);
     }